@@ -0,0 +1,161 @@
+"""
+Ingestion and categorisation benchmarks on synthetic statements.
+
+Generates Standard Chartered account and Journey card exports of each size, then runs the
+production path: ingest into the Parquet transaction store, read it back deduplicated,
+export and categorise (against the offline FakeGeminiModel). Each size runs in its own
+process with its own store and categorisation cache, so memory and cache hits don't carry
+over between sizes. Rows/sec and peak memory are recorded per stage, compared with
+baselines.json, and any stage whose throughput falls more than --tolerance below its
+baseline is flagged.
+
+    python benchmarks/run_benchmarks.py --sizes 1k 100k
+    python benchmarks/run_benchmarks.py --sizes 1k 100k 1m --update-baselines
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent / 'src'))
+
+import functions
+import instrumentation
+from config import config
+from ai_functions import build_categorisation_context, categorise_with_rules
+from categorisation_cache import CategorisationCache, categories_hash
+from fake_gemini import FakeGeminiModel
+from ingestion_manifest import IngestionManifest
+from rule_classifier import RuleClassifier
+from synthetic_statements import write_account_statement, write_credit_card_statement
+from transaction_store import TransactionStore
+
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+BASELINES_PATH = BENCHMARK_DIR / 'baselines.json'
+RESULTS_PATH = BENCHMARK_DIR / 'results' / 'latest.json'
+
+# Stages measured for every size, in pipeline order
+STAGES = ['ingest', 'store_read', 'export.csv', 'categorise']
+
+def run_size(size, rows, workers):
+    """
+    Run every stage on rows transactions per statement and return the stage results.
+
+    Each stage's peak_rss_mb is the process's peak resident memory once that stage has
+    finished, so it only grows from stage to stage; run each size in a fresh process (as
+    main does) for numbers that don't include earlier sizes.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        file_paths = [
+            write_account_statement(os.path.join(work_dir, f'bonussaver_{size}.csv'), rows, seed=1),
+            write_credit_card_statement(os.path.join(work_dir, f'journey_{size}.csv'), rows, seed=2),
+        ]
+        store_dir = os.path.join(work_dir, 'store')
+        manifest = IngestionManifest(os.path.join(store_dir, 'manifest.json'))
+        store = TransactionStore(store_dir)
+        streaming_threshold_mb = config.get('ingestion.streaming_threshold_mb')
+
+        peak_rss = {}
+        with instrumentation.capture() as report:
+            with report.stage('ingest') as stage:
+                functions.ingest_files(
+                    file_paths, manifest, store, workers,
+                    streaming_threshold_bytes=streaming_threshold_mb * 1024 * 1024 if streaming_threshold_mb is not None else None,
+                    chunksize=config.get('ingestion.chunksize', 100000)
+                )
+                stage.rows = sum(manifest.get(file_path)['rows'] for file_path in file_paths)
+                stage.bytes_read = sum(os.path.getsize(file_path) for file_path in file_paths)
+            peak_rss['ingest'] = instrumentation.peak_rss_mb()
+
+            with report.stage('store_read') as stage:
+                transactions = store.read(manifest.hashes(), deduplicate=True)
+                stage.rows = len(transactions)
+            peak_rss['store_read'] = instrumentation.peak_rss_mb()
+
+            functions.export_transactions(transactions, f'combined_{size}', ['csv'], work_dir)
+            peak_rss['export.csv'] = instrumentation.peak_rss_mb()
+
+            expense_categories = config.get('expense_categories', {})
+            context = build_categorisation_context(expense_categories, config.get('paynow_vendors', []),
+                                                   config.get('external_individuals', []))
+            # A fresh cache per size, so every size categorises its descriptions from cold
+            cache = CategorisationCache(os.path.join(work_dir, 'cache.sqlite'), categories_hash(expense_categories))
+            try:
+                with report.stage('categorise') as stage:
+                    categorise_with_rules(FakeGeminiModel(latency=0), transactions[['Transaction', 'Deposit', 'Withdrawal']],
+                                          context, RuleClassifier.from_config(config), cache, max_concurrency=4)
+                    stage.rows = len(transactions)
+            finally:
+                cache.close()
+            peak_rss['categorise'] = instrumentation.peak_rss_mb()
+
+    results = report.to_dict()
+    stages = {name: dict(results['stages'][name], peak_rss_mb=peak_rss[name]) for name in STAGES}
+    return {'rows': len(transactions), 'peak_rss_mb': results['peak_rss_mb'], 'stages': stages}
+
+def run_size_in_subprocess(size, workers):
+    """Run one size in a fresh interpreter and return its results"""
+    result = subprocess.run([sys.executable, __file__, '--measure', size, '--workers', str(workers)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+def compare(results, baselines, tolerance):
+    """Return a message for every stage whose rows/sec regressed beyond tolerance"""
+    regressions = []
+    for size, result in results.items():
+        for name, stage in result['stages'].items():
+            baseline = baselines.get(size, {}).get('stages', {}).get(name, {}).get('rows_per_sec')
+            current = stage.get('rows_per_sec')
+            if baseline and current and current < baseline * (1 - tolerance):
+                regressions.append(f"{size} {name}: {current:,.0f} rows/s vs baseline {baseline:,.0f} "
+                                   f"({current / baseline - 1:+.0%})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and categorisation on synthetic statements")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['1k', '100k'],
+                        help="Rows per synthetic statement")
+    parser.add_argument('--workers', type=int, default=1, help="Parser processes, as ingestion.workers")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Flag stages more than this fraction slower than their baseline")
+    parser.add_argument('--update-baselines', action='store_true', help="Save these results as the new baselines")
+    # Internal: measure one size in this process and print its results as JSON
+    parser.add_argument('--measure', choices=list(SIZES), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # Keep per-file DEBUG/INFO logging from dominating the timings
+    logging.disable(logging.INFO)
+
+    if args.measure:
+        print(json.dumps(run_size(args.measure, SIZES[args.measure], args.workers)))
+        return 0
+
+    results = {}
+    for size in args.sizes:
+        results[size] = run_size_in_subprocess(size, args.workers)
+        for name, stage in results[size]['stages'].items():
+            print(f"{size:>5} {name:<12} {stage['seconds']:>8.3f}s {stage.get('rows_per_sec', 0):>12,.0f} rows/s "
+                  f"{stage['peak_rss_mb']:>8} MB")
+
+    RESULTS_PATH.parent.mkdir(exist_ok=True)
+    RESULTS_PATH.write_text(json.dumps(results, indent=2) + '\n')
+
+    baselines = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+    if args.update_baselines:
+        baselines.update(results)
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=2) + '\n')
+        print(f"Updated baselines in {BASELINES_PATH}")
+        return 0
+
+    regressions = compare(results, baselines, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Synthetic Standard Chartered statement exports for benchmarks, in the layouts the parsers expect"""
+import random
+from datetime import date, timedelta
+
+# Descriptions mixing rule-matched merchants, repeat merchants and one-off payees
+MERCHANTS = [
+    'PAYNOW-GRABFOOD', 'GRAB*RIDE SINGAPORE', 'NTUC FAIRPRICE BEDOK', 'COLD STORAGE TAMPINES',
+    'SHOPEE SINGAPORE', 'AMAZON.COM SEATTLE', 'NETFLIX.COM', 'SP DIGITAL', 'STARBUCKS RAFFLES',
+    'GUARDIAN HEALTH', 'UNIQLO ION', 'BUS/MRT TRANSIT', 'SINGTEL MOBILE', 'DON DON DONKI',
+]
+FOREIGN_CURRENCIES = [('USD', 1.35), ('EUR', 1.45), ('JPY', 0.009), ('MYR', 0.29)]
+
+# Longest history a statement spans, so a million rows still land on realistic dates
+MAX_HISTORY_DAYS = 3650
+
+def _dates(rng, rows, start):
+    """Non-decreasing statement dates, a handful of transactions per day (more for huge statements)"""
+    next_day_probability = min(0.2, MAX_HISTORY_DAYS / max(rows, 1))
+    day = start
+    for _ in range(rows):
+        if rng.random() < next_day_probability:
+            day += timedelta(days=1)
+        yield day
+
+def _description(rng):
+    if rng.random() < 0.1:
+        # One-off payees with reference numbers, like PayNow transfers to individuals
+        return f"PAYNOW TRANSFER {rng.randrange(10**9):09d} OTHR PAYEE {rng.randrange(5000)}"
+    return f"{rng.choice(MERCHANTS)} {rng.randrange(10**5):05d}"
+
+def write_account_statement(file_path, rows, seed=0, start=date(2020, 1, 1)):
+    """Write a savings account export with rows transactions and return its path"""
+    rng = random.Random(seed)
+    balance = 10000.0
+    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(f"Account transactions shown:,{start:%d/%m/%Y} - 31/12/2099\n")
+        f.write("Currency:,SGD\n")
+        f.write(",\n")
+        f.write(f"BONUS$AVER ACCOUNT,'{rng.randrange(10**10):010d}\n")
+        f.write(",\n")
+        f.write("Date,Transaction,Currency,Deposit,Withdrawal,Running Balance\n")
+        for day in _dates(rng, rows, start):
+            amount = round(rng.uniform(1, 300), 2)
+            if rng.random() < 0.05:
+                deposit, withdrawal = f"{amount * 20:,.2f}", ""
+                balance += amount * 20
+            else:
+                deposit, withdrawal = "", f"{amount:,.2f}"
+                balance -= amount
+            f.write(f'"{day:%d/%m/%Y}","{_description(rng)}","SGD","{deposit}","{withdrawal}","{balance:,.2f} CR"\n')
+    return file_path
+
+def write_credit_card_statement(file_path, rows, seed=0, start=date(2020, 1, 1)):
+    """Write a Journey credit card export with rows transactions and return its path"""
+    rng = random.Random(seed)
+    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(f"JOURNEY CARD,'5555-{rng.randrange(10**4):04d}-{rng.randrange(10**4):04d}-{rng.randrange(10**4):04d}\n")
+        f.write("\n")
+        f.write(f"Statement Date,{start:%d/%m/%Y}\n")
+        f.write("Date,DESCRIPTION,Foreign Currency Amount,SGD Amount\n")
+        for day in _dates(rng, rows, start):
+            amount = round(rng.uniform(1, 500), 2)
+            foreign = ''
+            if rng.random() < 0.15:
+                currency, rate = rng.choice(FOREIGN_CURRENCIES)
+                foreign = f"{currency} {amount / rate:.2f}"
+            side = 'CR' if rng.random() < 0.03 else 'DR'
+            f.write(f'{day:%d/%m/%Y},{_description(rng)},{foreign},"SGD {amount:,.2f} {side}"\n')
+        f.write("\n")
+        f.write('Current Balance,"SGD 0.00"\n')
+    return file_path
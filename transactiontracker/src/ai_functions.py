@@ -1,16 +1,77 @@
-import google.generativeai as genai
 import os
 import pandas as pd
-import yaml
-import re
 import json
-from logger import setup_logger
+import datetime
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import functions
+import instrumentation
+from logger import setup_logger, Payload
 from config import config
+from categorisation_cache import normalize_descriptions, open_categorisation_cache
+from rule_classifier import RuleClassifier
+from embedding_classifier import open_embedding_classifier
 
 logger = setup_logger(__name__)
 
+# Most function-calling round trips for one chat message before giving up
+MAX_TOOL_ROUNDS = 5
+
+CHAT_INSTRUCTIONS = """You are a personal finance assistant for the user's bank and credit card transactions.
+Answer questions about their spending by calling the provided functions, which query the data locally.
+Withdrawal is money out, Deposit is money in. Totals, averages and min_amount use one reporting currency
+when one is configured; each result's amounts_in says which currency its totals are in.
+Call list_categories first if you are unsure which category names or date range exist.
+Keep answers short and quote the figures the functions return."""
+
+def _plain(value):
+    """Convert the SDK's proto map/list wrappers in function call arguments to plain Python"""
+    if hasattr(value, 'items'):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) or (hasattr(value, '__iter__') and not isinstance(value, (str, bytes))):
+        return [_plain(item) for item in value]
+    return value
+
+def _response_parts(response):
+    return response.candidates[0].content.parts if response.candidates else []
+
+def send_with_tools(chat_session, engine, message, max_rounds=MAX_TOOL_ROUNDS):
+    """
+    Send a chat message, running any function calls the model makes against the local query engine.
+
+    Each round, the model's function calls are executed locally and only their small results
+    are sent back, until the model answers in text.
+
+    Returns:
+        str: The model's final answer.
+    """
+    response = chat_session.send_message(message)
+    for _ in range(max_rounds):
+        calls = [part.function_call for part in _response_parts(response)
+                 if getattr(part, 'function_call', None) and part.function_call.name]
+        if not calls:
+            break
+
+        results = []
+        for call in calls:
+            args = _plain(call.args) if call.args else {}
+            logger.info("Chat tool call %s(%s)", call.name, args)
+            result = engine.call(call.name, args)
+            logger.debug("Chat tool result: %s", Payload(json.dumps(result, default=str)))
+            results.append({'function_response': {'name': call.name, 'response': {'result': result}}})
+        response = chat_session.send_message(results)
+    else:
+        logger.warning("Model was still calling functions after %s rounds", max_rounds)
+
+    return ''.join(getattr(part, 'text', '') or '' for part in _response_parts(response))
+
 def initial_gemini_chat():
     logger.info("Google Gemini Chat Initialising")
+    import google.generativeai as genai
+    from query_engine import TransactionQueryEngine, TOOL_DECLARATIONS
 
     # Get API key from environment variables
     API_KEY = config.get_secret('GEMINI_API_KEY')
@@ -26,12 +87,18 @@ def initial_gemini_chat():
 
         # Initialize the Gemini model
         model_name = config.get('api.gemini_model')        
-        logger.debug(f"Using model: {model_name}")  
-        model = genai.GenerativeModel(model_name)
+        logger.debug("Using model: %s", model_name)  
+        model = genai.GenerativeModel(
+            model_name,
+            tools=[{'function_declarations': TOOL_DECLARATIONS}],
+            system_instruction=CHAT_INSTRUCTIONS
+        )
 
+        # Questions about the data are answered by local queries the model calls as functions
+        engine = TransactionQueryEngine.from_outputs()
         chat_session = model.start_chat(history=[])
         logger.debug("Chat session started successfully")
-        print("💬 Gemini Chatbot - Type 'exit' to quit.\n")
+        print("💬 Gemini Chatbot - ask about your transactions, or type 'exit' to quit.\n")
 
         while True:
             user_input = input("You: ")
@@ -39,10 +106,10 @@ def initial_gemini_chat():
                 print("Goodbye! 👋")
                 break
         
-            logger.debug(f"Sending message: {user_input}")
-            response = chat_session.send_message(content=user_input)
-            print("Gemini:", response.text)
-            logger.debug(f"Received message: {response.text}")   
+            logger.debug("Sending message: %s", Payload(user_input))
+            answer = send_with_tools(chat_session, engine, user_input)
+            print("Gemini:", answer)
+            logger.debug("Received message: %s", Payload(answer))
     finally:
         # Cleanup genai resources
         if hasattr(genai, '_client'):
@@ -51,6 +118,594 @@ def initial_gemini_chat():
 
         logger.info("Chat session ended successfully")      
 
+# Gemini output token budget for a single categorisation request
+MAX_OUTPUT_TOKENS = 8192
+# Rough characters-per-token ratio used to estimate token counts before sending
+CHARS_PER_TOKEN = 4
+# Only plan to use this share of the output budget, leaving headroom for estimation error
+OUTPUT_BUDGET_HEADROOM = 0.75
+# Stable row identifier used to merge chunked responses back onto the input
+ROW_ID_COLUMN = 'Row ID'
+# HTTP status codes worth retrying: rate limited or transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Exponential backoff bounds in seconds
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+# Gemini answers each transaction with an [id, category_index, subcategory_index] tuple
+RESPONSE_SCHEMA = {
+    'type': 'array',
+    'items': {'type': 'array', 'items': {'type': 'integer'}}
+}
+
+# Numbered categories plus the static prompt instructions shared by every chunk
+CategorisationContext = namedtuple('CategorisationContext', ['categories', 'instructions'])
+
+class TokenBucket:
+    """Thread-safe token bucket that refills continuously up to a per-minute capacity"""
+
+    def __init__(self, capacity_per_minute):
+        self.capacity = float(capacity_per_minute)
+        self.tokens = self.capacity
+        self.refill_rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Block until the requested number of tokens is available, then take them"""
+        # A single request larger than the bucket can never fit, so cap it at a full bucket
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.refill_rate
+            time.sleep(wait)
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute quotas for one model"""
+
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def acquire(self, token_count):
+        """Wait until one more request of token_count tokens fits within the quotas"""
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens:
+            self.tokens.acquire(token_count)
+
+def build_rate_limiter(model_name):
+    """Create a RateLimiter from the api.rate_limits quotas configured for a model"""
+    # Model names contain dots, so look them up in the dict rather than via dot notation
+    rate_limits = config.get('api.rate_limits', {}) or {}
+    limits = rate_limits.get(model_name) or rate_limits.get('default') or {}
+    logger.debug("Rate limits for %s: %s", model_name, limits)
+    return RateLimiter(rpm=limits.get('rpm'), tpm=limits.get('tpm'))
+
+def is_retryable_error(error):
+    """True for rate limit (429) and transient server (5xx) errors"""
+    code = getattr(error, 'code', None)
+    try:
+        return int(code) in RETRYABLE_STATUS_CODES
+    except (TypeError, ValueError):
+        return False
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def generate_with_retry(model, prompt, generation_config=None, rate_limiter=None,
+                        expected_output_tokens=0, max_retries=5):
+    """
+    Call model.generate_content, respecting the rate limiter and retrying transient errors.
+
+    Args:
+        expected_output_tokens (int): Output tokens to reserve against the TPM quota on top of the prompt.
+        max_retries (int): Retries after the first attempt for 429/5xx errors.
+    """
+    token_count = estimate_tokens(prompt) + expected_output_tokens
+    attempt = 0
+    while True:
+        if rate_limiter:
+            rate_limiter.acquire(token_count)
+        try:
+            with instrumentation.stage('gemini.generate_content') as stage:
+                response = model.generate_content(prompt, generation_config=generation_config)
+                usage = getattr(response, 'usage_metadata', None)
+                stage.tokens_in = getattr(usage, 'prompt_token_count', 0) or 0
+                stage.tokens_out = getattr(usage, 'candidates_token_count', 0) or 0
+                # Prompt tokens served from an explicit or implicit context cache
+                stage.tokens_cached = getattr(usage, 'cached_content_token_count', 0) or 0
+            return response
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            delay = backoff_delay(attempt)
+            attempt += 1
+            logger.warning("Gemini request failed (%s), retry %s/%s in %.1fs", e, attempt, max_retries, delay)
+            time.sleep(delay)
+
+def estimate_tokens(text):
+    """Rough token count for a piece of text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def rows_per_chunk(df, max_output_tokens=MAX_OUTPUT_TOKENS):
+    """
+    Work out how many transactions fit in one Gemini response.
+
+    Each row comes back as a compact [row_id, category_index, subcategory_index] tuple,
+    so the per-row output cost only depends on how many digits the largest row ID has.
+    Numbers tokenise poorly, so every character of the tuple is counted as a token.
+    """
+    if df.empty:
+        return 1
+
+    largest_tuple = json.dumps([len(df), 99, 99]) + ','
+    tokens_per_row = len(largest_tuple)
+
+    budget = max_output_tokens * OUTPUT_BUDGET_HEADROOM
+    return max(1, int(budget // tokens_per_row))
+
+def chunk_dataframe(df, chunk_size):
+    """Yield consecutive slices of the DataFrame with at most chunk_size rows"""
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+def build_categorisation_context(expense_categories, paynow_vendors=None, external_individuals=None):
+    """
+    Build the static part of the categorisation prompt, shared by every chunk.
+
+    Categories and sub-categories are numbered so Gemini can answer with indexes
+    instead of repeating the names for every row.
+    """
+    categories = [(category, list(subcategories or [])) for category, subcategories in expense_categories.items()]
+
+    category_lines = []
+    for category_index, (category, subcategories) in enumerate(categories):
+        numbered = ', '.join(f"{index} {subcategory}" for index, subcategory in enumerate(subcategories))
+        category_lines.append(f"{category_index} {category}: {numbered}")
+
+    hint_lines = []
+    for vendor in paynow_vendors or []:
+        hint_lines.append(f"{vendor['vendor']} => {vendor['category']} / {vendor['subcategory']}")
+    for individual in external_individuals or []:
+        hint_lines.append(f"{individual['name']} => {individual['category']} / {individual['subcategory']}")
+
+    newline = '\n'
+    instructions = f"""You are a financial transaction categorizer.
+
+Categories, as "category_index category_name: subcategory_index subcategory_name, ...":
+{newline.join(category_lines)}
+
+Known PayNow vendors and individuals (description contains => category / sub-category):
+{newline.join(hint_lines) or 'None'}
+
+Each transaction is one line "id|description|amount", where a negative amount is money spent and a positive amount is money received.
+PayNow transactions contain "PAYNOW" in the description; transfers to the individuals above are transfers.
+
+Respond ONLY with a JSON array containing one [id, category_index, subcategory_index] array of integers per transaction."""
+
+    return CategorisationContext(categories=categories, instructions=instructions)
+
+def encode_transactions(chunk_df):
+    """Encode a chunk as compact 'id|description|amount' lines"""
+    if 'Transaction' in chunk_df.columns:
+        descriptions = (chunk_df['Transaction'].fillna('').astype(str)
+                        .str.replace(r'[|\s]+', ' ', regex=True)
+                        .str.strip())
+    else:
+        descriptions = pd.Series('', index=chunk_df.index)
+
+    amount = pd.Series(0.0, index=chunk_df.index)
+    if 'Deposit' in chunk_df.columns:
+        amount = amount + pd.to_numeric(chunk_df['Deposit'], errors='coerce').fillna(0)
+    if 'Withdrawal' in chunk_df.columns:
+        amount = amount - pd.to_numeric(chunk_df['Withdrawal'], errors='coerce').fillna(0)
+
+    lines = chunk_df[ROW_ID_COLUMN].astype(str) + '|' + descriptions + '|' + amount.map('{:.2f}'.format)
+    return '\n'.join(lines)
+
+def build_categorisation_prompt(context, chunk_df):
+    """Build the categorisation prompt for one chunk of transactions"""
+    return f"""{context.instructions}
+
+Transactions:
+```
+{encode_transactions(chunk_df)}
+```"""
+
+def parse_categorisation_response(response_text, context, row_ids):
+    """
+    Parse and validate a compact categorisation response.
+
+    Tuples with unknown row IDs or out-of-range category indexes are dropped, as are
+    repeats of a row ID already seen.
+
+    Returns:
+        pd.DataFrame: 'Row ID', 'Category' and 'Sub-Category' for each valid tuple.
+    """
+    tuples = json.loads(response_text)
+    if not isinstance(tuples, list):
+        raise ValueError(f"Expected a JSON array, got {type(tuples).__name__}")
+
+    row_ids = set(row_ids)
+    seen = set()
+    records = []
+    invalid = 0
+    for item in tuples:
+        if (not isinstance(item, list) or len(item) != 3
+                or not all(isinstance(value, int) and not isinstance(value, bool) for value in item)):
+            invalid += 1
+            continue
+
+        row_id, category_index, subcategory_index = item
+        if row_id not in row_ids or row_id in seen or not 0 <= category_index < len(context.categories):
+            invalid += 1
+            continue
+
+        category, subcategories = context.categories[category_index]
+        subcategory = subcategories[subcategory_index] if 0 <= subcategory_index < len(subcategories) else None
+        seen.add(row_id)
+        records.append((row_id, category, subcategory))
+
+    if invalid:
+        logger.warning("Dropped %s invalid tuples from Gemini response", invalid)
+
+    return pd.DataFrame(records, columns=[ROW_ID_COLUMN, 'Category', 'Sub-Category'])
+
+def categorise_chunk(model, context, chunk_df, max_output_tokens=MAX_OUTPUT_TOKENS,
+                     rate_limiter=None, max_retries=5):
+    """
+    Send one chunk of transactions to Gemini and return its categories.
+
+    If the response is cut off at the output limit or isn't a valid JSON array, the chunk
+    is split in half and each half is sent again, down to single rows, rather than losing
+    the whole chunk. A single row that still gets no usable response is left uncategorised.
+
+    Returns:
+        pd.DataFrame: 'Row ID', 'Category' and 'Sub-Category' for the rows Gemini returned.
+    """
+    prompt = build_categorisation_prompt(context, chunk_df)
+    logger.debug("Prompt: %s", Payload(prompt))
+
+    # Set generation parameters to maximize completion
+    response = generate_with_retry(
+        model,
+        prompt,
+        # A plain dict is accepted in place of genai.types.GenerationConfig, and keeps the SDK import lazy
+        generation_config=dict(
+            temperature=0.1,  # Lower temperature for more deterministic output
+            top_p=0.95,
+            top_k=40,
+            max_output_tokens=max_output_tokens,  # Request maximum tokens
+            response_mime_type="application/json",  # Request JSON response
+            response_schema=RESPONSE_SCHEMA  # ...as [id, category_index, subcategory_index] tuples
+        ),
+        rate_limiter=rate_limiter,
+        expected_output_tokens=max_output_tokens,
+        max_retries=max_retries
+    )
+
+    try:
+        if stopped_at_output_limit(response):
+            raise ValueError("Response stopped at max_output_tokens")
+        logger.debug("Response: %s", Payload(response.text))
+        return parse_categorisation_response(response.text, context, chunk_df[ROW_ID_COLUMN])
+    except ValueError as e:  # Includes json.JSONDecodeError
+        if len(chunk_df) < 2:
+            logger.warning("Unusable response for row %s (%s), leaving it uncategorised",
+                           chunk_df[ROW_ID_COLUMN].iloc[0], e)
+            return pd.DataFrame(columns=[ROW_ID_COLUMN, 'Category', 'Sub-Category'])
+        half = len(chunk_df) // 2
+        logger.warning("Unusable response for %s rows (%s), retrying as two chunks of %s and %s rows",
+                       len(chunk_df), e, half, len(chunk_df) - half)
+        return pd.concat([
+            categorise_chunk(model, context, part, max_output_tokens, rate_limiter, max_retries)
+            for part in (chunk_df.iloc[:half], chunk_df.iloc[half:])
+        ], ignore_index=True)
+
+def stopped_at_output_limit(response):
+    """Whether Gemini stopped generating because it reached max_output_tokens"""
+    for candidate in getattr(response, 'candidates', None) or []:
+        finish_reason = getattr(candidate, 'finish_reason', None)
+        if getattr(finish_reason, 'name', finish_reason) in ('MAX_TOKENS', 2):
+            return True
+    return False
+
+def categorise_dataframe(model, df, context, max_output_tokens=MAX_OUTPUT_TOKENS,
+                         max_concurrency=1, rate_limiter=None, max_retries=5):
+    """
+    Categorise every row of a DataFrame, splitting it into token-budgeted chunks.
+
+    Each chunk is sent as its own request and the results are merged back onto the
+    input by a stable row ID, so rows Gemini drops are left uncategorised rather than
+    shifting the categories of the rows after them. Up to max_concurrency chunks are
+    in flight at once, paced by the optional rate limiter.
+
+    Returns:
+        pd.DataFrame: The input transactions with 'Category' and 'Sub-Category' columns,
+        or None if no chunk could be categorised.
+    """
+    df = df.drop(columns=['Category', 'Sub-Category'], errors='ignore').reset_index(drop=True)
+    df.insert(0, ROW_ID_COLUMN, range(len(df)))
+
+    chunk_size = rows_per_chunk(df, max_output_tokens)
+    total_chunks = (len(df) + chunk_size - 1) // chunk_size
+    max_concurrency = max(1, min(max_concurrency, total_chunks))
+    logger.info("Categorising %s transactions in %s chunks of up to %s rows, %s at a time",
+                len(df), total_chunks, chunk_size, max_concurrency)
+
+    chunk_results = []
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {}
+        for chunk_number, chunk_df in enumerate(chunk_dataframe(df, chunk_size), start=1):
+            logger.debug("Queueing chunk %s/%s for categorization", chunk_number, total_chunks)
+            future = executor.submit(categorise_chunk, model, context, chunk_df,
+                                     max_output_tokens, rate_limiter, max_retries)
+            futures[future] = (chunk_number, len(chunk_df))
+
+        for future in as_completed(futures):
+            chunk_number, chunk_rows = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error("Error categorising chunk %s/%s: %s", chunk_number, total_chunks, e, exc_info=True)
+                continue
+
+            if len(results) < chunk_rows:
+                logger.warning("Chunk %s/%s: Gemini returned %s of %s rows", chunk_number, total_chunks, len(results), chunk_rows)
+            chunk_results.append(results)
+
+    if not chunk_results:
+        logger.error("No chunks were categorised successfully")
+        return None
+
+    categories = pd.concat(chunk_results, ignore_index=True)
+    categorized_df = df.merge(categories, on=ROW_ID_COLUMN, how='left')
+
+    missing = categorized_df['Category'].isna().sum()
+    if missing:
+        logger.warning("%s transactions were left uncategorised", missing)
+
+    return categorized_df.drop(columns=ROW_ID_COLUMN)
+
+def categorise_with_cache(model, df, context, cache=None, embeddings=None, **kwargs):
+    """
+    Categorise transactions, answering repeat descriptions from the categorisation cache.
+
+    Only one row per uncached normalized description goes on to categorise_with_embeddings
+    and Gemini. Its categories are applied to every row sharing that description and
+    written back to the cache. Extra keyword arguments are passed through to
+    categorise_dataframe.
+
+    Returns:
+        pd.DataFrame: The input transactions with 'Category' and 'Sub-Category' columns,
+        or None if nothing could be categorised.
+    """
+    if cache is None or 'Transaction' not in df.columns:
+        return categorise_with_embeddings(model, df, context, embeddings, **kwargs)
+
+    df = df.drop(columns=['Category', 'Sub-Category'], errors='ignore').reset_index(drop=True)
+    keys = normalize_descriptions(df['Transaction'])
+    unique_keys = keys.unique()
+    known = cache.lookup(unique_keys)
+
+    hit_mask = keys.isin(list(known))
+    logger.info("Categorisation cache: %s hits, %s misses (%s of %s descriptions cached)",
+                hit_mask.sum(), (~hit_mask).sum(), len(known), len(unique_keys))
+
+    miss_keys = keys[~hit_mask].drop_duplicates()
+    if not miss_keys.empty:
+        categorized = categorise_with_embeddings(model, df.loc[miss_keys.index], context, embeddings, **kwargs)
+        if categorized is not None:
+            # Results keep row order, so they line up with miss_keys
+            new_categories = {
+                key: (category, sub_category if pd.notna(sub_category) else None)
+                for key, category, sub_category in zip(miss_keys, categorized['Category'], categorized['Sub-Category'])
+                if pd.notna(category)
+            }
+            cache.store(new_categories)
+            known.update(new_categories)
+
+    if not known:
+        return None
+
+    df['Category'] = keys.map({key: value[0] for key, value in known.items()})
+    df['Sub-Category'] = keys.map({key: value[1] for key, value in known.items()})
+    return df
+
+def categorise_with_embeddings(model, df, context, embeddings=None, **kwargs):
+    """
+    Categorise new descriptions from their nearest already-categorised neighbours, then Gemini.
+
+    Rows whose best neighbour in the embedding index is similar enough take its categories;
+    only low-confidence rows go on to categorise_dataframe, which receives the extra
+    keyword arguments.
+
+    Returns:
+        pd.DataFrame: The input transactions with 'Category' and 'Sub-Category' columns,
+        or None if nothing could be categorised.
+    """
+    df = df.drop(columns=['Category', 'Sub-Category'], errors='ignore').reset_index(drop=True)
+    if embeddings is None or 'Transaction' not in df.columns:
+        return categorise_dataframe(model, df, context, **kwargs)
+
+    neighbours = embeddings.classify(df['Transaction'])
+    df[['Category', 'Sub-Category']] = neighbours[['Category', 'Sub-Category']]
+    unmatched = df['Category'].isna()
+    logger.info("Embedding classifier matched %s of %s transactions", (~unmatched).sum(), len(df))
+
+    if unmatched.any():
+        rest = categorise_dataframe(model, df.loc[unmatched], context, **kwargs)
+        if rest is not None:
+            df.loc[unmatched, 'Category'] = rest['Category'].to_numpy()
+            df.loc[unmatched, 'Sub-Category'] = rest['Sub-Category'].to_numpy()
+        elif unmatched.all():
+            return None
+
+    return df
+
+def categorise_with_rules(model, df, context, rules=None, cache=None, embeddings=None, **kwargs):
+    """
+    Categorise transactions with the rule classifier first, then the cache, nearest neighbours and Gemini.
+
+    Rows matched by a rule are final; only unmatched rows go on to categorise_with_cache.
+    Extra keyword arguments are passed through to categorise_dataframe.
+
+    Returns:
+        pd.DataFrame: The input transactions with 'Category' and 'Sub-Category' columns,
+        or None if nothing could be categorised.
+    """
+    df = df.drop(columns=['Category', 'Sub-Category'], errors='ignore').reset_index(drop=True)
+    if rules is None or 'Transaction' not in df.columns:
+        return categorise_with_cache(model, df, context, cache, embeddings, **kwargs)
+
+    df[['Category', 'Sub-Category']] = rules.classify(df['Transaction'])
+    unmatched = df['Category'].isna()
+    logger.info("Rule classifier matched %s of %s transactions", (~unmatched).sum(), len(df))
+
+    if unmatched.any():
+        rest = categorise_with_cache(model, df.loc[unmatched], context, cache, embeddings, **kwargs)
+        if rest is not None:
+            df.loc[unmatched, 'Category'] = rest['Category'].to_numpy()
+            df.loc[unmatched, 'Sub-Category'] = rest['Sub-Category'].to_numpy()
+        elif unmatched.all():
+            return None
+
+    return df
+
+# Refresh the cached instructions this long before they expire
+CONTEXT_CACHE_REFRESH_SECONDS = 300
+
+class GeminiCategoriser:
+    """
+    Long-lived Gemini client for categorisation, reused across chunks and batches.
+
+    genai is configured once and a single model, with its connection pool, serves every
+    request. The instructions and numbered categories are the same for every chunk, so the
+    model holds them instead of each prompt: as Gemini cached content when the API accepts
+    it, otherwise as the model's system instruction, a fixed prefix the API's implicit
+    caching can reuse. Requests then carry only the transaction rows.
+
+    It can be passed anywhere a model is expected; generate_content strips the context's
+    instructions from prompts built by build_categorisation_prompt.
+    """
+
+    def __init__(self, model_name, context, api_key, rate_limiter=None, context_cache=True,
+                 cache_ttl_seconds=3600):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.model_name = model_name
+        self.context = context
+        self.rate_limiter = rate_limiter
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cached_content = None
+        self.cache_expires_at = 0.0
+        self.lock = threading.Lock()
+
+        # Local record of how often the static prefix was reused instead of resent
+        self.prefix_tokens = estimate_tokens(context.instructions)
+        self.prefix_reuses = 0
+
+        self.model = self._create_cached_model() if context_cache else None
+        if self.model is None:
+            self.model = genai.GenerativeModel(model_name, system_instruction=context.instructions)
+
+    def _create_cached_model(self):
+        """Cache the instructions with the API, returning a model that uses them or None"""
+        from google.generativeai import caching
+        try:
+            self.cached_content = caching.CachedContent.create(
+                model=self.model_name,
+                display_name='transaction-categorisation',
+                system_instruction=self.context.instructions,
+                ttl=datetime.timedelta(seconds=self.cache_ttl_seconds)
+            )
+        except Exception as e:
+            # e.g. the instructions are below the model's minimum cacheable size
+            logger.info("Context caching unavailable (%s), sending the instructions as a system instruction", e)
+            return None
+
+        self.cache_expires_at = time.monotonic() + self.cache_ttl_seconds
+        logger.info("Cached the categorisation instructions as %s", self.cached_content.name)
+        return self.genai.GenerativeModel.from_cached_content(cached_content=self.cached_content)
+
+    def _keep_cache_alive(self):
+        """Extend the cached content's TTL before it expires, falling back to a system instruction if that fails"""
+        with self.lock:
+            if self.cached_content is None or time.monotonic() < self.cache_expires_at - CONTEXT_CACHE_REFRESH_SECONDS:
+                return
+            try:
+                self.cached_content.update(ttl=datetime.timedelta(seconds=self.cache_ttl_seconds))
+                self.cache_expires_at = time.monotonic() + self.cache_ttl_seconds
+            except Exception as e:
+                logger.warning("Could not extend the cached instructions (%s), sending them as a system instruction", e)
+                self.cached_content = None
+                self.model = self.genai.GenerativeModel(self.model_name, system_instruction=self.context.instructions)
+
+    def generate_content(self, prompt, generation_config=None):
+        """Send a prompt, leaving out the instructions the model already holds"""
+        if prompt.startswith(self.context.instructions):
+            prompt = prompt[len(self.context.instructions):].lstrip()
+            with self.lock:
+                self.prefix_reuses += 1
+
+        self._keep_cache_alive()
+        return self.model.generate_content(prompt, generation_config=generation_config)
+
+    def close(self):
+        """Delete the cached instructions and close the genai client"""
+        logger.info("Reused the ~%s-token categorisation instructions in %s requests (%s)",
+                    self.prefix_tokens, self.prefix_reuses,
+                    'context cache' if self.cached_content is not None else 'system instruction')
+        if self.cached_content is not None:
+            try:
+                self.cached_content.delete()
+            except Exception as e:
+                logger.warning("Could not delete cached instructions %s: %s", self.cached_content.name, e)
+            self.cached_content = None
+
+        if hasattr(self.genai, '_client'):
+            logger.debug("Closing genai client")
+            self.genai._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def open_gemini_categoriser():
+    """Create a GeminiCategoriser from config.yaml, or None if there is no API key"""
+    api_key = config.get_secret('GEMINI_API_KEY')
+    if not api_key:
+        logger.error("GEMINI_API_KEY not found in environment variables")
+        return None
+    logger.info("API key loaded successfully")
+
+    model_name = config.get('api.gemini_model')
+    logger.debug("Using model: %s", model_name)
+    context = build_categorisation_context(
+        config.get('expense_categories', {}),
+        config.get('paynow_vendors', []),
+        config.get('external_individuals', [])
+    )
+    return GeminiCategoriser(
+        model_name,
+        context,
+        api_key,
+        rate_limiter=build_rate_limiter(model_name),
+        context_cache=config.get('api.context_cache', True),
+        cache_ttl_seconds=config.get('api.context_cache_ttl_seconds', 3600)
+    )
+
 def initial_gemini_csv_categorisation(input_file=None):
     """
     Process a CSV file of transactions using Gemini to categorize expenses.
@@ -61,161 +716,91 @@ def initial_gemini_csv_categorisation(input_file=None):
     Returns:
         pd.DataFrame: Categorized transactions dataframe with 'Category' and 'Sub-Category' columns.
     """
-    logger.info("Google Gemini CSV Categorization Initializing")
-
-    # Get API key from environment variables
-    API_KEY = config.get_secret('GEMINI_API_KEY')
-    if not API_KEY:
-        logger.error("GEMINI_API_KEY not found in environment variables")
-        return None
-        
-    logger.info("API key loaded successfully")
-
     # TODO - Move this csv to config.yaml   
     # Determine input file path
     if input_file is None:
         input_file = os.path.join(config.output_dir, 'combined_transactions_gemTest1.csv')
     
     if not os.path.exists(input_file):
-        logger.error(f"Input file not found: {input_file}")
+        logger.error("Input file not found: %s", input_file)
         return None
     
     # Read the CSV file
     try:
         df = pd.read_csv(input_file)
-        logger.info(f"Successfully read {len(df)} transactions from {input_file}")
-        
-        # Limit the number of rows to prevent response truncation
-        max_rows = 50  # Adjust this number based on your needs
-        if len(df) > max_rows:
-            logger.warning(f"Limiting to {max_rows} transactions to prevent response truncation")
-            df = df.head(max_rows)
+        logger.info("Successfully read %s transactions from %s", len(df), input_file)
     except Exception as e:
-        logger.error(f"Error reading CSV file: {str(e)}")
+        logger.error("Error reading CSV file: %s", e)
         return None
     
-    # Get the expense categories from config
-    expense_categories = config.get('expense_categories', {})
-    paynow_vendors = config.get('paynow_vendors', [])
-    external_individuals = config.get('external_individuals', [])
-    
-    # Convert config to YAML string for the prompt
-    categories_yaml = yaml.dump({
-        'expense_categories': expense_categories,
-        'paynow_vendors': paynow_vendors,
-        'external_individuals': external_individuals
-    }, default_flow_style=False)
+    return gemini_dataframe_categorisation(df)
+
+def gemini_dataframe_categorisation(df, categoriser=None):
+    """
+    Categorize a DataFrame of transactions using the rules, the cache and Gemini.
+
+    The result is saved as categorized_transactions.parquet in output_dir, plus any
+    formats listed under export.formats in config.yaml.
+
+    Args:
+        categoriser (GeminiCategoriser, optional): Client to reuse, e.g. across watch mode batches.
+            Without one, a categoriser is opened for this call and closed afterwards.
+
+    Returns:
+        pd.DataFrame: Categorized transactions dataframe with 'Category' and 'Sub-Category' columns.
+    """
+    logger.info("Google Gemini Categorization Initializing")
+
+    owns_categoriser = categoriser is None
+    if owns_categoriser:
+        categoriser = open_gemini_categoriser()
+        if categoriser is None:
+            return None
     
+    # The embedding step is optional: without it rows go on to the cache and Gemini
     try:
-        # Configure the API and Gemini
-        genai.configure(api_key=API_KEY)
+        embeddings = open_embedding_classifier()
+    except Exception as e:
+        logger.warning("Could not build the embedding classifier, continuing without it: %s", e, exc_info=True)
+        embeddings = None
 
-        # Initialize the Gemini model
-        model_name = config.get('api.gemini_model')        
-        logger.debug(f"Using model: {model_name}")  
-        model = genai.GenerativeModel(model_name)
-        
-        # Prepare the prompt with clear instructions about JSON format
-        prompt = f"""
-        You are a financial transaction categorizer. I will provide you with a CSV of financial transactions and a YAML configuration of expense categories.
-        
-        Here is the YAML configuration for expense categories:
-        ```yaml
-        {categories_yaml}
-        ```
-        
-        Your task is to:
-        1. Analyze each transaction in the CSV
-        2. Assign a 'Category' and 'Sub-Category' to each transaction based on the YAML configuration
-        3. Pay special attention to PayNow transactions (containing "PAYNOW" in the description) and match them to vendors in the paynow_vendors list
-        4. Identify transactions to individuals that should be categorized as transfers based on the external_individuals list
-        
-        Here is the CSV data:
-        ```
-        {df.to_csv(index=False)}
-        ```
-        
-        IMPORTANT: Respond ONLY with a valid, complete JSON array. Each object in the array must have all the original columns plus 'Category' and 'Sub-Category'. 
-        Do not include any explanations, markdown formatting, or code blocks in your response. Just return the raw JSON array.
-        """
+    cache = None
+    try:
+        cache = open_categorisation_cache(config.get('expense_categories', {}))
+        categorized_df = categorise_with_rules(
+            categoriser, df, categoriser.context, RuleClassifier.from_config(config), cache, embeddings,
+            max_output_tokens=config.get('api.max_output_tokens', MAX_OUTPUT_TOKENS),
+            max_concurrency=config.get('api.max_concurrency', 1),
+            rate_limiter=categoriser.rate_limiter,
+            max_retries=config.get('api.max_retries', 5)
+        )
+        if categorized_df is None:
+            return None
+
+        logger.info("Successfully categorized %s of %s transactions", categorized_df['Category'].notna().sum(), len(categorized_df))
         
-        logger.debug("Sending transaction data to Gemini for categorization")
-        logger.debug(f"Prompt: {prompt}")
+        # Save to Parquet, keeping the column types
+        output_file = os.path.join(config.output_dir, "categorized_transactions.parquet")
+        categorized_df.to_parquet(output_file, index=False)
+        logger.info("Saved categorized transactions to %s", output_file)
         
-        # Set generation parameters to maximize completion
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.1,  # Lower temperature for more deterministic output
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=8192,  # Request maximum tokens
-                response_mime_type="application/json"  # Request JSON response
-            )
-        )
+        # Optional CSV/Excel copies for viewing
+        functions.export_transactions(categorized_df, "categorized_transactions",
+                                      config.get('export.formats', []), config.output_dir)
         
-        logger.debug(f"Response: {response.text}")
-
-        # Process the response
-        try:
-            # Clean up the response text
-            response_text = response.text.strip()
-            
-            # Remove any markdown code block indicators if present
-            response_text = re.sub(r'```json\s*', '', response_text)
-            response_text = re.sub(r'```\s*$', '', response_text)
-            
-            # Try to parse the JSON
-            try:
-                transactions_data = json.loads(response_text)
-                logger.info("Successfully parsed JSON response")
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON from full response: {str(e)}")
-                
-                # Try to extract valid JSON from the response
-                json_match = re.search(r'\[\s*\{.*\}\s*\]', response_text, re.DOTALL)
-                if json_match:
-                    try:
-                        transactions_data = json.loads(json_match.group(0))
-                        logger.info("Successfully extracted and parsed JSON from response")
-                    except json.JSONDecodeError:
-                        logger.error("Failed to parse extracted JSON")
-                        return None
-                else:
-                    logger.error("Could not find valid JSON array in response")
-                    return None
-            
-            # Convert JSON to DataFrame
-            categorized_df = pd.DataFrame(transactions_data)
-            logger.info(f"Successfully categorized {len(categorized_df)} transactions")
-            
-            # Save to CSV file
-            output_file = os.path.join(config.output_dir, "categorized_transactions.csv")
-            categorized_df.to_csv(output_file, index=False)
-            logger.info(f"Saved categorized transactions to {output_file}")
-            
-            # Also save to Excel for better viewing
-            output_excel = os.path.join(config.output_dir, "categorized_transactions.xlsx")
-            categorized_df.to_excel(output_excel, index=False)
-            logger.info(f"Saved categorized transactions to {output_excel}")
-            
-            return categorized_df
-            
-        except Exception as e:
-            logger.error(f"Error processing Gemini response: {str(e)}", exc_info=True)
-            return None
+        return categorized_df
             
     except Exception as e:
-        logger.error(f"Error during Gemini categorization: {str(e)}", exc_info=True)
+        logger.error("Error during Gemini categorization: %s", e, exc_info=True)
         return None
         
     finally:
-        # Cleanup genai resources
-        if hasattr(genai, '_client'):
-            logger.debug("Closing genai client") 
-            genai._client.close()
+        if cache is not None:
+            cache.close()
+        if owns_categoriser:
+            categoriser.close()
             
-        logger.info("Gemini CSV categorization completed")
+        logger.info("Gemini categorization completed")
 
 def send_csv_to_gemini_and_return_df(chat_session, file_path):
     """Helper function to send CSV to Gemini and process the response"""
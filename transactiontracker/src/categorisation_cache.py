@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from logger import setup_logger
+from config import config
+
+logger = setup_logger(__name__)
+
+# SQLite caps the number of bound parameters per statement, so look keys up in batches
+LOOKUP_BATCH_SIZE = 500
+
+def normalize_descriptions(descriptions):
+    """
+    Normalize a Series of transaction descriptions into cache keys.
+
+    Upper-cases, drops long digit runs (reference and card numbers that change every
+    month) and collapses whitespace, so repeat merchants map to the same key.
+    """
+    return (descriptions.fillna('').astype(str)
+            .str.upper()
+            .str.replace(r'\d{4,}', ' ', regex=True)
+            .str.replace(r'\s+', ' ', regex=True)
+            .str.strip())
+
+def categories_hash(expense_categories):
+    """Stable hash of the expense_categories config, so changing the categories invalidates the cache"""
+    payload = json.dumps(expense_categories, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+class CategorisationCache:
+    """On-disk SQLite cache of Category/Sub-Category keyed on normalized description"""
+
+    def __init__(self, db_path, config_hash, max_entries=100000, max_age_days=365):
+        self.db_path = str(db_path)
+        self.config_hash = config_hash
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS categories (
+                description TEXT NOT NULL,
+                config_hash TEXT NOT NULL,
+                category TEXT NOT NULL,
+                sub_category TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (description, config_hash)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_categories_updated_at ON categories (updated_at)")
+        self.connection.commit()
+        self.evict()
+
+    def lookup(self, descriptions):
+        """
+        Look up normalized descriptions.
+
+        Returns:
+            dict: description -> (category, sub_category) for every cache hit.
+        """
+        descriptions = list(descriptions)
+        hits = {}
+        for start in range(0, len(descriptions), LOOKUP_BATCH_SIZE):
+            batch = descriptions[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.connection.execute(
+                f"SELECT description, category, sub_category FROM categories "
+                f"WHERE config_hash = ? AND description IN ({placeholders})",
+                [self.config_hash, *batch]
+            )
+            for description, category, sub_category in rows:
+                hits[description] = (category, sub_category)
+        return hits
+
+    def store(self, categories):
+        """Store a dict of description -> (category, sub_category)"""
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO categories (description, config_hash, category, sub_category, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(description, self.config_hash, category, sub_category, now)
+             for description, (category, sub_category) in categories.items()]
+        )
+        self.connection.commit()
+        logger.debug("Stored %s descriptions in categorisation cache", len(categories))
+
+    def evict(self):
+        """Drop entries older than max_age_days, then the oldest entries beyond max_entries"""
+        cutoff = time.time() - self.max_age_days * 24 * 60 * 60
+        expired = self.connection.execute("DELETE FROM categories WHERE updated_at < ?", (cutoff,)).rowcount
+
+        count = self.connection.execute("SELECT COUNT(*) FROM categories").fetchone()[0]
+        overflow = max(0, count - self.max_entries)
+        if overflow:
+            self.connection.execute(
+                "DELETE FROM categories WHERE rowid IN "
+                "(SELECT rowid FROM categories ORDER BY updated_at ASC LIMIT ?)",
+                (overflow,)
+            )
+        self.connection.commit()
+
+        if expired or overflow:
+            logger.info("Evicted %s expired and %s overflow entries from categorisation cache", expired, overflow)
+
+    def close(self):
+        self.connection.close()
+
+def open_categorisation_cache(expense_categories):
+    """Open the categorisation cache configured in config.yaml, or None if it is disabled"""
+    if not config.get('categorisation_cache.enabled', True):
+        logger.info("Categorisation cache disabled")
+        return None
+
+    db_path = os.path.join(config.cache_dir, 'categorisation_cache.sqlite')
+    return CategorisationCache(
+        db_path,
+        categories_hash(expense_categories),
+        max_entries=config.get('categorisation_cache.max_entries', 100000),
+        max_age_days=config.get('categorisation_cache.max_age_days', 365)
+    )
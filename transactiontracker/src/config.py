@@ -1,17 +1,28 @@
 import os
 from pathlib import Path
-import yaml
-from dotenv import load_dotenv
-from string import Template
 
 class Config:
+    """
+    Settings from config.yaml and secrets from .env.
+
+    Both files are read on first use rather than at import, so importing config is free
+    for code that never asks for a setting.
+    """
+
     def __init__(self):
-        self._config = {}
-        self._load_config()
-        self._load_env()
-        
-        # Ensure logs directory exists
-        self.logs_dir.mkdir(exist_ok=True)
+        self._loaded = None
+
+    def load(self):
+        """Read config.yaml and .env if that hasn't happened yet"""
+        if self._loaded is None:
+            self._loaded = self._load_config()
+            self._load_env()
+        return self._loaded
+
+    @property
+    def _config(self):
+        """The parsed config.yaml, loaded on first access"""
+        return self.load()
 
     @property
     def project_root(self) -> Path:
@@ -20,36 +31,51 @@ class Config:
 
     def _load_config(self):
         """Load YAML configuration file"""
+        import yaml
+
         config_path = self.project_root / 'config.yaml'
         
         with open(config_path, 'r') as f:
             # Load YAML first
-            self._config = yaml.safe_load(f)
+            loaded = yaml.safe_load(f)
             
-            # Handle variable substitution for paths
-            if 'paths' in self._config:
-                for key, value in self._config['paths'].items():
-                    if isinstance(value, str):
-                        self._config['paths'][key] = value.replace('${paths.data}', self._config['paths']['data'])
+            # Handle variable substitution for paths, wherever they are used
+            data_path = (loaded.get('paths') or {}).get('data')
+            if data_path is not None:
+                loaded = self._substitute(loaded, '${paths.data}', data_path)
+        return loaded
+
+    @classmethod
+    def _substitute(cls, value, placeholder, replacement):
+        """Replace a placeholder in every string of a nested config value"""
+        if isinstance(value, dict):
+            return {key: cls._substitute(item, placeholder, replacement) for key, item in value.items()}
+        if isinstance(value, list):
+            return [cls._substitute(item, placeholder, replacement) for item in value]
+        if isinstance(value, str):
+            return value.replace(placeholder, replacement)
+        return value
 
     def _load_env(self):
         """Load environment variables from .env file"""
+        from dotenv import load_dotenv
+
         env_path = self.project_root / '.env'
         load_dotenv(env_path)
 
     def get(self, key, default=None):
-        """Get a configuration value using dot notation"""
+        """Get a configuration value using dot notation, or default if any key on the path is missing"""
         keys = key.split('.')
         value = self._config
         for k in keys:
-            if isinstance(value, dict):
-                value = value.get(k)
-            else:
+            if not isinstance(value, dict) or k not in value:
                 return default
+            value = value[k]
         return value
 
     def get_secret(self, key, default=None):
         """Get a secret from environment variables"""
+        self.load()
         return os.getenv(key, default)
 
     @property
@@ -60,14 +86,24 @@ class Config:
     def output_dir(self):
         return self.get('paths.output_dir')
 
+    @property
+    def cache_dir(self):
+        return self.get('paths.cache_dir')
+
+    @property
+    def store_dir(self):
+        return self.get('paths.store_dir')
+
     @property
     def data_path(self):
         return self.get('paths.data')
         
     @property
     def logs_dir(self):
-        """Get the logs directory path"""
-        return self.project_root / 'logs'
+        """Get the logs directory path, creating it if needed; TRANSACTION_TRACKER_LOGS_DIR overrides it"""
+        logs_dir = Path(os.environ.get('TRANSACTION_TRACKER_LOGS_DIR') or self.project_root / 'logs')
+        logs_dir.mkdir(exist_ok=True)
+        return logs_dir
 
 # Create a global instance
 config = Config()
\ No newline at end of file
@@ -0,0 +1,96 @@
+from functools import lru_cache
+import pandas as pd
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Formats tried when inferring a file's date format, in order of preference.
+# Day-first formats come first, so ambiguous dates like 03/04/2024 are read the SG way.
+CANDIDATE_DATE_FORMATS = [
+    '%d/%m/%Y',
+    '%d/%m/%y',
+    '%d-%m-%Y',
+    '%d.%m.%Y',
+    '%d %b %Y',
+    '%d-%b-%Y',
+    '%d %b %y',
+    '%d %B %Y',
+    '%Y-%m-%d',
+    '%Y/%m/%d',
+    '%m/%d/%Y',
+    '%b %d, %Y',
+]
+
+# Distinct date strings used to infer a file's format
+DATE_SAMPLE_SIZE = 100
+
+@lru_cache(maxsize=256)
+def _infer_format_from_sample(sample):
+    """Pick the first candidate format that parses the whole sample, else the one that parses most of it"""
+    values = pd.Series(sample, dtype='string')
+    best_format, best_count = None, 0
+    for date_format in CANDIDATE_DATE_FORMATS:
+        count = pd.to_datetime(values, format=date_format, errors='coerce').notna().sum()
+        if count == len(values):
+            return date_format
+        if count > best_count:
+            best_format, best_count = date_format, count
+    return best_format
+
+def infer_date_format(values):
+    """
+    Infer the date format of a column of date strings from a sample of its distinct values.
+
+    Inference results are cached, so files sharing the same sample of dates don't repeat it.
+
+    Returns:
+        str: A strptime format, or None if no candidate format matches.
+    """
+    distinct = pd.Series(values, dtype='string').dropna().str.strip()
+    distinct = distinct[distinct != ''].unique()
+    if len(distinct) == 0:
+        return None
+
+    # Spread the sample across the column rather than only taking the first few days
+    step = max(1, len(distinct) // DATE_SAMPLE_SIZE)
+    sample = tuple(sorted(str(value) for value in distinct[::step][:DATE_SAMPLE_SIZE]))
+    return _infer_format_from_sample(sample)
+
+def parse_dates(values, date_format=None, parse_logger=None):
+    """
+    Parse a column of date strings with one explicit format.
+
+    Each distinct date string is converted once and mapped back onto the column, since
+    statements repeat the same date for many rows. Values that don't match the format
+    become NaT and are reported rather than failing the whole file.
+
+    Args:
+        values (pd.Series): Date strings.
+        date_format (str, optional): strptime format. Inferred from the values if not given.
+        parse_logger (logging.Logger, optional): Logger for the unparseable rows report.
+
+    Returns:
+        pd.Series: datetime64 values aligned with the input.
+    """
+    parse_logger = parse_logger or logger
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    strings = values.astype('string').str.strip()
+    date_format = date_format or infer_date_format(strings)
+    if date_format is None:
+        parse_logger.warning("Could not infer a date format for %s rows", len(strings))
+        return pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    parse_logger.debug("Parsing dates with format %s", date_format)
+
+    distinct = strings.dropna().unique()
+    lookup = pd.Series(pd.to_datetime(pd.Series(distinct, dtype='string'), format=date_format, errors='coerce').values,
+                       index=distinct)
+    parsed = strings.map(lookup).astype('datetime64[ns]')
+
+    unparseable = parsed.isna() & strings.notna() & (strings != '')
+    if unparseable.any():
+        examples = ', '.join(f"row {index}: {strings[index]!r}" for index in strings.index[unparseable][:5])
+        parse_logger.warning("%s rows have dates that don't match %s and were left empty (%s)",
+                             unparseable.sum(), date_format, examples)
+    return parsed
@@ -0,0 +1,57 @@
+import pandas as pd
+from logger import setup_logger
+from transaction_parsers import align_to_schema
+
+logger = setup_logger(__name__)
+
+# Columns that identify a transaction across overlapping statement downloads
+DEDUP_KEY_COLUMNS = ['Account Number', 'Date', 'Transaction', 'Deposit', 'Withdrawal', 'Running Balance']
+
+# Columns added to every stored row to find duplicates without re-hashing the history
+ROW_HASH_COLUMN = 'Row Hash'
+OCCURRENCE_COLUMN = 'Occurrence'
+DEDUP_COLUMNS = [ROW_HASH_COLUMN, OCCURRENCE_COLUMN]
+
+def row_hashes(transactions_df):
+    """
+    Vectorized 64-bit hash of each row's key columns.
+
+    Key columns are aligned to the declared dtypes first, so a row hashes the same
+    whether it was just parsed or read back from the store.
+    """
+    keys = align_to_schema(transactions_df, DEDUP_KEY_COLUMNS, categorical=False)
+    return pd.util.hash_pandas_object(keys, index=False).rename(ROW_HASH_COLUMN)
+
+def add_dedup_keys(transactions_df, seen=None):
+    """
+    Return a copy of transactions_df with Row Hash and Occurrence columns.
+
+    Occurrence numbers identical rows within one statement (0, 1, ...), so genuine
+    same-day repeats such as two identical coffees keep distinct keys, while the same
+    row downloaded in two overlapping statements gets the same key in both.
+
+    Args:
+        seen (dict, optional): Row Hash -> count of rows already seen from the same statement.
+            Used when a statement is processed in chunks; updated in place.
+    """
+    df = transactions_df.copy()
+    df[ROW_HASH_COLUMN] = row_hashes(df)
+    df[OCCURRENCE_COLUMN] = df.groupby(ROW_HASH_COLUMN, sort=False).cumcount().astype('int64')
+
+    if seen is not None:
+        offsets = df[ROW_HASH_COLUMN].map(seen).fillna(0).astype('int64')
+        df[OCCURRENCE_COLUMN] += offsets
+        for row_hash, count in df[ROW_HASH_COLUMN].value_counts().items():
+            seen[row_hash] = seen.get(row_hash, 0) + count
+    return df
+
+def drop_duplicate_transactions(transactions_df):
+    """Drop rows whose (Row Hash, Occurrence) key was already seen, keeping the first copy"""
+    if transactions_df.empty:
+        return transactions_df
+
+    duplicates = transactions_df.duplicated(subset=DEDUP_COLUMNS, keep='first')
+    if duplicates.any():
+        logger.info("Dropped %s duplicate transactions from overlapping statements", duplicates.sum())
+        transactions_df = transactions_df[~duplicates]
+    return transactions_df
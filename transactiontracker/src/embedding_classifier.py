@@ -0,0 +1,302 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+from logger import setup_logger
+from config import config
+from categorisation_cache import normalize_descriptions
+
+logger = setup_logger(__name__)
+
+# Queries by index rows scored per matrix multiply; the scores buffer is at most
+# SEARCH_BATCH_SIZE x SEARCH_BLOCK_SIZE float32 however large the index grows
+SEARCH_BATCH_SIZE = 1024
+SEARCH_BLOCK_SIZE = 8192
+
+class HashingEmbedder:
+    """
+    Offline embedder using hashed character n-grams of the normalized description.
+
+    Needs no model or network, and maps spelling variants of the same merchant
+    ('NTUC FAIRPRICE BEDOK' / 'NTUC FAIRPRICE TAMPINES') to nearby vectors.
+    """
+
+    def __init__(self, dimensions=1024, ngram_sizes=(3, 4, 5)):
+        self.dimensions = dimensions
+        self.ngram_sizes = tuple(ngram_sizes)
+        # Identifies vectors this configuration produces, e.g. in saved embeddings
+        self.signature = f"hashing-{dimensions}-{'-'.join(map(str, self.ngram_sizes))}"
+
+    def embed(self, texts):
+        """
+        Returns:
+            np.ndarray: float32 matrix with one L2-normalized row per text.
+        """
+        texts = [f" {text} " for text in texts]
+        rows, ngrams = [], []
+        for row, text in enumerate(texts):
+            for size in self.ngram_sizes:
+                grams = [text[start:start + size] for start in range(len(text) - size + 1)]
+                ngrams.extend(grams)
+                rows.extend([row] * len(grams))
+
+        embeddings = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        if ngrams:
+            # pandas' hash is seeded with a fixed key, so vectors are stable across runs
+            hashes = pd.util.hash_array(np.array(ngrams, dtype=object))
+            columns = (hashes % self.dimensions).astype(np.intp)
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+            np.add.at(embeddings, (np.array(rows, dtype=np.intp), columns), signs)
+        return normalize_rows(embeddings)
+
+class GeminiEmbedder:
+    """Embedder backed by the Gemini embedding API"""
+
+    def __init__(self, model_name='models/text-embedding-004', batch_size=100):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.signature = f"gemini-{model_name}"
+
+    def embed(self, texts):
+        import google.generativeai as genai
+
+        texts = list(texts)
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            result = genai.embed_content(model=self.model_name, content=texts[start:start + self.batch_size],
+                                         task_type='clustering')
+            embeddings.extend(result['embedding'])
+        return normalize_rows(np.array(embeddings, dtype=np.float32).reshape(len(texts), -1))
+
+# Embedding backends selectable with embedding_classifier.backend in config.yaml
+EMBEDDERS = {
+    'hashing': HashingEmbedder,
+    'gemini': GeminiEmbedder,
+}
+
+def normalize_rows(matrix):
+    """Scale each row to unit length so dot products are cosine similarities"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def quantize_rows(matrix):
+    """Symmetric int8 quantization with a scale per row, returning (int8 matrix, scales)"""
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales = np.where(scales == 0, 1, scales).astype(np.float32)
+    return np.round(matrix / scales[:, None]).astype(np.int8), scales
+
+def cached_embeddings(embedder, texts, cache_path):
+    """
+    Embed texts, reusing vectors saved in cache_path by earlier runs.
+
+    Only texts without a saved vector are sent to the embedder, and the new vectors are
+    saved for next time, so the history isn't re-embedded (or re-sent to an API) every run.
+    """
+    texts = list(texts)
+    saved = {}
+    if os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as arrays:
+            saved = dict(zip(arrays['texts'].tolist(), arrays['vectors']))
+
+    missing = list(dict.fromkeys(text for text in texts if text not in saved))
+    if missing:
+        saved.update(zip(missing, embedder.embed(missing)))
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        temp_path = f"{cache_path}.tmp.npz"
+        np.savez(temp_path, texts=np.array(list(saved), dtype=str), vectors=np.stack(list(saved.values())))
+        os.replace(temp_path, cache_path)
+    logger.info("Embedded %s new descriptions, reused %s saved embeddings", len(missing), len(texts) - len(missing))
+
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([saved[text] for text in texts]).astype(np.float32)
+
+class VectorIndex:
+    """
+    Brute-force cosine top-k search over a NumPy matrix of unit vectors.
+
+    With quantize=True vectors are stored as int8 with one float32 scale per vector,
+    about a quarter of the float32 size, at a small cost in similarity precision.
+
+    Queries are scored against one block of index rows at a time, keeping a running top k
+    across blocks, so neither a full float32 copy of a quantized index nor a score for every
+    stored vector ever exists in memory.
+    """
+
+    def __init__(self, embeddings, quantize=False):
+        self.quantize = quantize
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if quantize:
+            self.vectors, self.scales = quantize_rows(embeddings)
+        else:
+            self.vectors = embeddings
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _block(self, block_start):
+        """float32 vectors of one block of index rows, dequantized if the index is quantized"""
+        block = slice(block_start, block_start + SEARCH_BLOCK_SIZE)
+        if self.quantize:
+            return self.vectors[block].astype(np.float32) * self.scales[block, None]
+        return self.vectors[block]
+
+    def search(self, queries, k=5):
+        """
+        Find the k most similar stored vectors for each query.
+
+        Returns:
+            tuple: (similarities, indices) arrays of shape (len(queries), k), best first.
+        """
+        k = min(k, len(self.vectors))
+        similarities = np.empty((len(queries), k), dtype=np.float32)
+        indices = np.empty((len(queries), k), dtype=np.intp)
+
+        for start in range(0, len(queries), SEARCH_BATCH_SIZE):
+            batch = np.asarray(queries[start:start + SEARCH_BATCH_SIZE], dtype=np.float32)
+            best_scores = np.full((len(batch), k), -np.inf, dtype=np.float32)
+            best_indices = np.zeros((len(batch), k), dtype=np.intp)
+
+            for block_start in range(0, len(self.vectors), SEARCH_BLOCK_SIZE):
+                scores = batch @ self._block(block_start).T
+
+                # argpartition finds each block's top k without sorting every score,
+                # then the block's candidates are merged with the best found so far
+                block_k = min(k, scores.shape[1])
+                top = np.argpartition(scores, -block_k, axis=1)[:, -block_k:]
+                candidate_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+                candidate_indices = np.concatenate([best_indices, top + block_start], axis=1)
+                keep = np.argpartition(-candidate_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(candidate_scores, keep, axis=1)
+                best_indices = np.take_along_axis(candidate_indices, keep, axis=1)
+
+            order = np.argsort(-best_scores, axis=1)
+            indices[start:start + len(batch)] = np.take_along_axis(best_indices, order, axis=1)
+            similarities[start:start + len(batch)] = np.take_along_axis(best_scores, order, axis=1)
+        return similarities, indices
+
+class EmbeddingClassifier:
+    """
+    Nearest-neighbour categoriser over already-categorised transactions.
+
+    Each new description is embedded and compared with the history's descriptions. The
+    top-k neighbours vote for a category weighted by similarity; rows whose best matching
+    neighbour is below the similarity threshold are left for Gemini. A description already
+    in the history takes its own categories outright, without a vote.
+    """
+
+    def __init__(self, embedder, descriptions, categories, sub_categories,
+                 similarity_threshold=0.85, top_k=5, quantize=False, embeddings=None):
+        """
+        Args:
+            embeddings (np.ndarray, optional): Precomputed vectors for descriptions, e.g. from
+                cached_embeddings; otherwise the descriptions are embedded here.
+        """
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.top_k = top_k
+        self.categories = np.asarray(categories, dtype=object)
+        self.sub_categories = np.asarray(sub_categories, dtype=object)
+        self.known = dict(zip(descriptions, zip(categories, sub_categories)))
+        if embeddings is None:
+            embeddings = embedder.embed(descriptions)
+        self.index = VectorIndex(embeddings, quantize=quantize)
+        logger.info("Built embedding index over %s categorised descriptions", len(self.index))
+
+    @classmethod
+    def from_history(cls, history_df, embedder, cache_path=None, **kwargs):
+        """
+        Build the index from categorised transactions, one entry per normalized description.
+
+        The most recent categorisation of a description wins. With cache_path, vectors are
+        reused from and saved to that file rather than embedding the whole history again.
+        """
+        history = history_df[history_df['Category'].notna()]
+        history = history.assign(Key=normalize_descriptions(history['Transaction']))
+        history = history[history['Key'] != ''].drop_duplicates('Key', keep='last')
+        descriptions = history['Key'].tolist()
+        if cache_path is not None and descriptions:
+            kwargs['embeddings'] = cached_embeddings(embedder, descriptions, cache_path)
+        return cls(embedder, descriptions, history['Category'].tolist(),
+                   history['Sub-Category'].tolist(), **kwargs)
+
+    def classify(self, descriptions):
+        """
+        Classify a Series of descriptions.
+
+        Returns:
+            pd.DataFrame: 'Category', 'Sub-Category' and 'Similarity' aligned with the input,
+            with Category NaN where no neighbour was similar enough.
+        """
+        result = pd.DataFrame({'Category': None, 'Sub-Category': None, 'Similarity': 0.0},
+                              index=descriptions.index)
+        if descriptions.empty or len(self.index) == 0:
+            return result
+
+        # Descriptions in the history are exact matches; the rest are embedded and searched once each
+        keys = normalize_descriptions(descriptions)
+        unique_keys = keys.unique()
+        labels = {key: (*self.known[key], 1.0) for key in unique_keys if key in self.known}
+        unique_keys = [key for key in unique_keys if key not in labels]
+        if not unique_keys:
+            return self._labelled(result, keys, labels)
+        similarities, indices = self.index.search(self.embedder.embed(unique_keys), self.top_k)
+
+        for key, row_similarities, row_indices in zip(unique_keys, similarities, indices):
+            votes = {}
+            for similarity, neighbour in zip(row_similarities, row_indices):
+                if similarity >= self.similarity_threshold:
+                    label = (self.categories[neighbour], self.sub_categories[neighbour])
+                    best, total = votes.get(label, (similarity, 0.0))
+                    votes[label] = (max(best, similarity), total + similarity)
+            if votes:
+                label, (best, _) = max(votes.items(), key=lambda item: item[1][1])
+                labels[key] = (label[0], label[1], float(best))
+        return self._labelled(result, keys, labels)
+
+    @staticmethod
+    def _labelled(result, keys, labels):
+        matched = keys.map(labels)
+        found = matched.notna()
+        result.loc[found, 'Category'] = [label[0] for label in matched[found]]
+        result.loc[found, 'Sub-Category'] = [label[1] for label in matched[found]]
+        result.loc[found, 'Similarity'] = [label[2] for label in matched[found]]
+        return result
+
+def load_categorised_history(output_dir):
+    """Previously categorised transactions from output_dir, or None if there are none yet"""
+    parquet_file = os.path.join(output_dir, 'categorized_transactions.parquet')
+    csv_file = os.path.join(output_dir, 'categorized_transactions.csv')
+    if os.path.exists(parquet_file):
+        return pd.read_parquet(parquet_file, columns=['Transaction', 'Category', 'Sub-Category'])
+    if os.path.exists(csv_file):
+        return pd.read_csv(csv_file, usecols=['Transaction', 'Category', 'Sub-Category'])
+    return None
+
+def open_embedding_classifier():
+    """Build the embedding classifier configured in config.yaml, or None if disabled or without history"""
+    if not config.get('embedding_classifier.enabled', True):
+        logger.info("Embedding classifier disabled")
+        return None
+
+    history_df = load_categorised_history(config.output_dir)
+    if history_df is None or history_df['Category'].notna().sum() == 0:
+        logger.info("No categorised history yet, skipping the embedding classifier")
+        return None
+
+    backend = config.get('embedding_classifier.backend', 'hashing')
+    if backend not in EMBEDDERS:
+        logger.warning("Unknown embedding backend %s, skipping the embedding classifier", backend)
+        return None
+    embedder = EMBEDDERS[backend](**(config.get(f'embedding_classifier.backend_options.{backend}') or {}))
+
+    # Vectors are saved per embedder configuration, so only new history is embedded each run
+    signature = re.sub(r'[^A-Za-z0-9.-]+', '_', embedder.signature)
+    return EmbeddingClassifier.from_history(
+        history_df,
+        embedder,
+        cache_path=os.path.join(config.cache_dir, f"embeddings.{signature}.npz"),
+        similarity_threshold=config.get('embedding_classifier.similarity_threshold', 0.85),
+        top_k=config.get('embedding_classifier.top_k', 5),
+        quantize=config.get('embedding_classifier.quantize', False)
+    )
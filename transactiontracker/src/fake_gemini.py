@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+
+class FakeRateLimitError(Exception):
+    """Stand-in for the 429 ResourceExhausted error raised by the Gemini API"""
+    code = 429
+
+class FakeUsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+class FakeResponse:
+    def __init__(self, text, prompt_token_count=0):
+        self.text = text
+        self.usage_metadata = FakeUsageMetadata(prompt_token_count, len(text) // 4 + 1)
+
+class FakeGeminiModel:
+    """
+    Offline stand-in for genai.GenerativeModel used to test categorisation throughput.
+
+    generate_content sleeps for a fixed latency to simulate the network round trip and
+    answers every transaction in the prompt with an [id, 0, 0] tuple, i.e. the first
+    category and sub-category, in the compact format the prompt asks for.
+    """
+
+    def __init__(self, latency=0.2, rate_limit_every=0):
+        """
+        Args:
+            latency (float): Seconds each generate_content call takes.
+            rate_limit_every (int): If set, every Nth call raises FakeRateLimitError.
+        """
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None):
+        with self.lock:
+            self.calls += 1
+            call_number = self.calls
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            time.sleep(self.latency)
+            if self.rate_limit_every and call_number % self.rate_limit_every == 0:
+                raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+            return FakeResponse(json.dumps(self._categorise(prompt)), len(prompt) // 4 + 1)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _categorise(self, prompt):
+        """Answer every transaction in the prompt with the first category and sub-category"""
+        transaction_block = prompt.split('Transactions:')[1].split('```')[1]
+        return [[int(line.split('|', 1)[0]), 0, 0] for line in transaction_block.strip().splitlines()]
+
+class FakeFunctionCall:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+class FakePart:
+    def __init__(self, text=None, function_call=None):
+        self.text = text
+        self.function_call = function_call
+
+class FakeChatResponse:
+    def __init__(self, parts):
+        content = type('FakeContent', (), {'parts': parts})()
+        self.candidates = [type('FakeCandidate', (), {'content': content})()]
+
+class FakeChatSession:
+    """
+    Offline stand-in for a Gemini chat session that uses function calling.
+
+    The first message is answered with the scripted function calls; once their results
+    are sent back, the session answers in text with the JSON it received, so tests can
+    check exactly what left the machine.
+    """
+
+    def __init__(self, function_calls):
+        """
+        Args:
+            function_calls (list): (name, args) tuples the model "calls" for every question.
+        """
+        self.function_calls = function_calls
+        self.sent = []
+
+    def send_message(self, content):
+        self.sent.append(content)
+        if isinstance(content, str):
+            return FakeChatResponse([FakePart(function_call=FakeFunctionCall(name, args))
+                                     for name, args in self.function_calls])
+        results = [part['function_response']['response']['result'] for part in content]
+        return FakeChatResponse([FakePart(text=json.dumps(results))])
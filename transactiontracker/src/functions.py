@@ -1,6 +1,11 @@
+import os
+import time
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from transaction_parsers import get_parser_for_file
-from logger import setup_logger
+from deduplication import add_dedup_keys
+import instrumentation
+from logger import setup_logger, worker_logging
 
 logger = setup_logger(__name__)
 
@@ -8,14 +13,203 @@ def process_transactions(file_path):
     """Process transactions from a file using the appropriate parser"""
     
     try:
-        logger.info(f"Getting parser for file: {file_path}")
-        parser = get_parser_for_file(file_path)
-        logger.debug(f"Using parser: {parser.__class__.__name__}")
-        
-        transactions_df = parser.parse_file(file_path)
-        logger.info(f"Successfully parsed {len(transactions_df)} transactions")
+        with instrumentation.stage('process_transactions') as stage:
+            logger.info("Getting parser for file: %s", file_path)
+            parser = get_parser_for_file(file_path)
+            logger.debug("Using parser: %s", parser.__class__.__name__)
+            
+            with instrumentation.stage(f"parse.{parser.__class__.__name__}") as parse_stage:
+                transactions_df = parser.parse_file(file_path)
+                parse_stage.rows = stage.rows = len(transactions_df)
+                parse_stage.bytes_read = stage.bytes_read = os.path.getsize(file_path)
+        logger.info("Successfully parsed %s transactions", len(transactions_df))
         return transactions_df
         
     except Exception as e:
-        logger.error(f"Error processing file {file_path}: {str(e)}", exc_info=True)
+        logger.error("Error processing file %s: %s", file_path, e, exc_info=True)
         return pd.DataFrame()  # Return empty DataFrame on error
+
+def process_transactions_timed(file_path):
+    """
+    Process a file and return (file_path, transactions DataFrame, seconds taken, stages).
+
+    stages holds the instrumentation recorded while parsing, so results from worker
+    processes can be merged into the parent's run report.
+    """
+    start = time.perf_counter()
+    with instrumentation.capture() as file_report:
+        transactions_df = process_transactions(file_path)
+    return file_path, transactions_df, time.perf_counter() - start, file_report.stages
+
+def _merge_stages(result):
+    file_path, transactions_df, elapsed, stages = result
+    instrumentation.report.merge(stages)
+    return file_path, transactions_df, elapsed
+
+def process_files(file_paths, workers=1):
+    """
+    Parse many transaction files, optionally in parallel worker processes.
+
+    Args:
+        file_paths (list): Paths of the files to parse.
+        workers (int): Number of worker processes. 1 parses in this process, 0 uses one per CPU.
+
+    Yields:
+        tuple: (file_path, transactions DataFrame, seconds taken) in the order of file_paths.
+        A file that fails yields an empty DataFrame, the same as process_transactions.
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(file_paths))
+
+    if workers <= 1:
+        for file_path in file_paths:
+            yield _merge_stages(process_transactions_timed(file_path))
+        return
+
+    logger.info("Parsing %s files with %s worker processes", len(file_paths), workers)
+    with worker_logging() as (initializer, initargs), \
+            ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        futures = [executor.submit(process_transactions_timed, file_path) for file_path in file_paths]
+        for file_path, future in zip(file_paths, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # A crashed worker or an unpicklable result only loses this file
+                logger.error("Error processing file %s in worker: %s", file_path, e, exc_info=True)
+                yield file_path, pd.DataFrame(), 0.0
+                continue
+            yield _merge_stages(result)
+
+def stream_transactions(file_path, sha256, store, chunksize):
+    """
+    Parse a file chunk by chunk, appending each normalized chunk straight to the store.
+
+    Peak memory stays at roughly one chunk regardless of the file's size. Dedup keys are
+    numbered across the whole file, so identical rows split over two chunks stay distinct.
+    If any chunk fails, the parts already written for the file are removed again.
+
+    Returns:
+        tuple: (rows stored, seconds taken)
+    """
+    start = time.perf_counter()
+    store.remove(sha256)
+    rows = 0
+    seen = {}
+    try:
+        parser = get_parser_for_file(file_path)
+        with instrumentation.stage(f"stream.{parser.__class__.__name__}") as stage:
+            stage.bytes_read = os.path.getsize(file_path)
+            for part, chunk_df in enumerate(parser.parse_file_chunks(file_path, chunksize)):
+                store.append(sha256, add_dedup_keys(chunk_df, seen), part)
+                rows += len(chunk_df)
+                logger.debug("Stored chunk %s of %s (%s rows so far)", part, file_path, rows)
+            stage.rows = rows
+    except Exception as e:
+        logger.error("Error streaming file %s: %s", file_path, e, exc_info=True)
+        store.remove(sha256)
+        rows = 0
+    return rows, time.perf_counter() - start
+
+def ingest_files(file_paths, manifest, store, workers=1, streaming_threshold_bytes=None, chunksize=100000):
+    """
+    Incrementally ingest statement files into the transaction store.
+
+    Only files that are new or changed according to the manifest are parsed. Files that
+    are no longer present are dropped from the manifest and the store. A file that fails
+    to parse is left out of the manifest so it is retried on the next run.
+
+    Files of at least streaming_threshold_bytes are streamed into the store chunksize rows
+    at a time instead of being parsed whole.
+
+    Returns:
+        int: Number of files added, updated or removed.
+    """
+    pending = {}
+    for file_path in file_paths:
+        status, sha256 = manifest.check(file_path)
+        if status == 'unchanged':
+            logger.debug("Skipping unchanged file: %s", file_path)
+        else:
+            logger.info("Found %s file: %s", status, file_path)
+            pending[file_path] = sha256
+
+    def release(sha256):
+        # Two paths can hold identical content, so only drop data no file still refers to
+        if sha256 not in manifest.hashes():
+            store.remove(sha256)
+
+    present = {manifest.key(file_path) for file_path in file_paths}
+    removed = [path for path in manifest.paths() if path not in present]
+    for path in removed:
+        logger.info("File no longer present, removing from store: %s", path)
+        release(manifest.forget(path)['sha256'])
+
+    def recorded(file_path, sha256, rows):
+        previous = manifest.get(file_path)
+        manifest.record(file_path, sha256, rows)
+        if previous and previous['sha256'] != sha256:
+            release(previous['sha256'])
+
+    large = []
+    if streaming_threshold_bytes is not None:
+        large = [file_path for file_path in pending if os.path.getsize(file_path) >= streaming_threshold_bytes]
+
+    updated = 0
+    for file_path in large:
+        rows, elapsed = stream_transactions(file_path, pending[file_path], store, chunksize)
+        filename = os.path.basename(file_path)
+        if not rows:
+            logger.warning("No transactions found in %s (%.2fs)", filename, elapsed)
+            continue
+
+        recorded(file_path, pending[file_path], rows)
+        updated += 1
+        logger.info("Successfully streamed %s transactions from %s in %.2fs", rows, filename, elapsed)
+
+    small = [file_path for file_path in pending if file_path not in large]
+    for file_path, transactions_df, elapsed in process_files(small, workers):
+        filename = os.path.basename(file_path)
+        if transactions_df.empty:
+            logger.warning("No transactions found in %s (%.2fs)", filename, elapsed)
+            continue
+
+        store.write(pending[file_path], transactions_df)
+        recorded(file_path, pending[file_path], len(transactions_df))
+
+        updated += 1
+        logger.info("Successfully processed %s transactions from %s in %.2fs", len(transactions_df), filename, elapsed)
+
+    manifest.save()
+    logger.info("Ingested %s new or changed files, removed %s, skipped %s unchanged",
+                updated, len(removed), len(file_paths) - len(pending))
+    return updated + len(removed)
+
+# Writers for the optional on-demand export formats
+EXPORT_WRITERS = {
+    'csv': lambda df, path: df.to_csv(path, index=False),
+    'xlsx': lambda df, path: df.to_excel(path, index=False),
+}
+
+def export_transactions(transactions_df, name, formats, output_dir):
+    """
+    Export transactions as <name>.<format> in output_dir for each requested format.
+
+    Returns:
+        list: Paths of the files written.
+    """
+    written = []
+    for export_format in formats or []:
+        writer = EXPORT_WRITERS.get(export_format)
+        if writer is None:
+            logger.warning("Unsupported export format: %s", export_format)
+            continue
+
+        output_file = os.path.join(output_dir, f"{name}.{export_format}")
+        with instrumentation.stage(f"export.{export_format}") as stage:
+            writer(transactions_df, output_file)
+            stage.rows = len(transactions_df)
+            stage.bytes_written = os.path.getsize(output_file)
+        written.append(output_file)
+        logger.info("Saved %s transactions to %s", len(transactions_df), output_file)
+    return written
@@ -0,0 +1,102 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+from logger import setup_logger
+from config import config
+from ingestion_manifest import file_sha256
+
+logger = setup_logger(__name__)
+
+# Columns of the FX rate file: Rate is units of the reporting currency per unit of Currency
+RATE_COLUMNS = ['Date', 'Currency', 'Rate']
+
+# Columns added by normalize_currency
+REPORTING_COLUMNS = ['FX Rate', 'Reporting Deposit', 'Reporting Withdrawal']
+
+def read_rate_file(rates_file):
+    """Parse an FX rate CSV into a table sorted by Date, as merge_asof needs"""
+    rates = pd.read_csv(rates_file, usecols=RATE_COLUMNS, dtype={'Currency': 'string'})
+    rates['Date'] = pd.to_datetime(rates['Date'], format='%Y-%m-%d', errors='coerce')
+    rates['Currency'] = rates['Currency'].str.strip().str.upper()
+    rates['Rate'] = pd.to_numeric(rates['Rate'], errors='coerce')
+
+    invalid = rates.isna().any(axis=1) | (rates['Rate'] <= 0)
+    if invalid.any():
+        logger.warning("Skipped %s invalid rows in FX rate file %s", invalid.sum(), rates_file)
+    return (rates[~invalid]
+            .drop_duplicates(['Date', 'Currency'], keep='last')
+            .sort_values(['Date', 'Currency'])
+            .reset_index(drop=True))
+
+def load_fx_rates(rates_file, cache_dir):
+    """
+    Load the FX rate table, from the Parquet cache when the rate file hasn't changed.
+
+    The cache is named after the rate file's content hash, so an edited or replaced
+    file is re-parsed once and the stale cache is removed.
+    """
+    sha256 = file_sha256(rates_file)
+    cache_file = os.path.join(cache_dir, f"fx_rates.{sha256[:16]}.parquet")
+    if os.path.exists(cache_file):
+        logger.debug("Loading FX rates from cache %s", cache_file)
+        return pd.read_parquet(cache_file)
+
+    rates = read_rate_file(rates_file)
+    os.makedirs(cache_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(cache_dir, 'fx_rates.*.parquet')):
+        os.remove(stale)
+    rates.to_parquet(cache_file, index=False)
+    logger.info("Cached %s FX rates for %s currencies in %s", len(rates), rates['Currency'].nunique(), cache_file)
+    return rates
+
+def normalize_currency(transactions_df, rates, reporting_currency='SGD'):
+    """
+    Convert Deposit and Withdrawal to the reporting currency.
+
+    Every row takes the latest rate on or before its date for its Currency, found with a
+    single merge_asof over the whole frame rather than per-row lookups. Rows already in the
+    reporting currency use a rate of 1; rows with no earlier rate are left empty.
+
+    Returns:
+        pd.DataFrame: transactions_df with 'FX Rate', 'Reporting Deposit' and 'Reporting Withdrawal'.
+    """
+    df = transactions_df.copy()
+    currencies = df['Currency'].astype('string').str.upper()
+
+    # merge_asof needs both sides sorted on Date; remember the original order to restore it
+    left = pd.DataFrame({
+        'Position': range(len(df)),
+        'Date': df['Date'].astype('datetime64[ns]'),
+        'Currency': currencies,
+    }).dropna(subset=['Date']).sort_values('Date', kind='stable')
+    right = rates.assign(Date=rates['Date'].astype('datetime64[ns]'), Currency=rates['Currency'].astype('string'))
+    matched = pd.merge_asof(left, right, on='Date', by='Currency', direction='backward')
+
+    fx_rate = np.full(len(df), np.nan)
+    fx_rate[matched['Position'].to_numpy()] = matched['Rate'].to_numpy()
+    fx_rate[(currencies == reporting_currency.upper()).fillna(False).to_numpy()] = 1.0
+
+    missing = np.isnan(fx_rate) & currencies.notna().to_numpy()
+    if missing.any():
+        examples = ', '.join(sorted(currencies[missing].unique())[:5])
+        logger.warning("No FX rate to %s for %s transactions (%s)", reporting_currency, missing.sum(), examples)
+
+    df['FX Rate'] = fx_rate
+    df['Reporting Deposit'] = df['Deposit'] * df['FX Rate']
+    df['Reporting Withdrawal'] = df['Withdrawal'] * df['FX Rate']
+    return df
+
+def open_fx_rates():
+    """Load the rate table configured under fx in config.yaml, or None if there is none"""
+    rates_file = config.get('fx.rates_file')
+    if not rates_file:
+        logger.debug("No FX rate file configured, skipping currency normalization")
+        return None
+    if not os.path.exists(rates_file):
+        logger.info("FX rate file %s not found, skipping currency normalization", rates_file)
+        return None
+    return load_fx_rates(rates_file, config.cache_dir)
+
+def reporting_currency():
+    return config.get('fx.reporting_currency') or 'SGD'
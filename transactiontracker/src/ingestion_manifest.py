@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import time
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Read size when hashing statement files
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def file_sha256(file_path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IngestionManifest:
+    """
+    JSON record of which statement files have been ingested into the transaction store.
+
+    Entries are keyed on absolute path and hold size, mtime, content hash and row count.
+    A file whose size and mtime are unchanged is trusted without re-hashing; otherwise its
+    content hash decides whether it really changed (e.g. a re-download of the same statement).
+    """
+
+    def __init__(self, manifest_path):
+        self.manifest_path = str(manifest_path)
+        self.files = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.files = json.load(f).get('files', {})
+        logger.debug("Loaded manifest with %s files from %s", len(self.files), self.manifest_path)
+
+    @staticmethod
+    def key(file_path):
+        return os.path.abspath(file_path)
+
+    def check(self, file_path):
+        """
+        Compare a file against the manifest.
+
+        Returns:
+            tuple: (status, sha256) where status is 'new', 'changed' or 'unchanged'.
+        """
+        entry = self.files.get(self.key(file_path))
+        stat = os.stat(file_path)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return 'unchanged', entry['sha256']
+
+        sha256 = file_sha256(file_path)
+        if entry is None:
+            return 'new', sha256
+        if entry['sha256'] == sha256:
+            # Touched but identical - remember the new mtime so we don't hash it again next run
+            entry['size'], entry['mtime'] = stat.st_size, stat.st_mtime
+            return 'unchanged', sha256
+        return 'changed', sha256
+
+    def record(self, file_path, sha256, rows):
+        """Record a file as ingested"""
+        stat = os.stat(file_path)
+        self.files[self.key(file_path)] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': sha256,
+            'rows': rows,
+            'ingested_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+    def forget(self, file_path):
+        """Remove a file from the manifest, returning its old entry (or None)"""
+        return self.files.pop(self.key(file_path), None)
+
+    def get(self, file_path):
+        return self.files.get(self.key(file_path))
+
+    def paths(self):
+        return list(self.files)
+
+    def hashes(self):
+        """Unique content hashes of every ingested file, in path order"""
+        return list(dict.fromkeys(self.files[path]['sha256'] for path in sorted(self.files)))
+
+    def save(self):
+        """Write the manifest atomically"""
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.files}, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
@@ -0,0 +1,65 @@
+import os
+import time
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class InputWatcher:
+    """
+    Polls the input directory and reports when its statement files change.
+
+    A change is only reported once the directory has looked the same for a whole poll
+    interval, so a statement that is still being downloaded or copied isn't ingested
+    half-written. Polling needs no extra dependencies and behaves the same on every
+    platform and on network or synced folders, where inotify-style events are unreliable.
+    """
+
+    def __init__(self, input_dir, interval=2.0):
+        self.input_dir = str(input_dir)
+        self.interval = interval
+        # Files as of the last reported change; empty so the first scan reports what's already there
+        self.snapshot = {}
+
+    def scan(self):
+        """Size and modification time of every file in the input directory, keyed on path"""
+        files = {}
+        with os.scandir(self.input_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def changed_paths(self, files):
+        """Paths added, modified or removed compared with the last reported snapshot"""
+        paths = {path for path, signature in files.items() if self.snapshot.get(path) != signature}
+        paths.update(path for path in self.snapshot if path not in files)
+        return sorted(paths)
+
+    def run(self, on_change, max_batches=None):
+        """
+        Call on_change(paths) for each settled change until interrupted.
+
+        Args:
+            on_change (callable): Receives the sorted list of added, modified or removed paths.
+            max_batches (int, optional): Return after this many changes, e.g. for tests.
+        """
+        logger.info("Watching %s for new statements every %ss", self.input_dir, self.interval)
+        batches = 0
+        pending = None
+        while max_batches is None or batches < max_batches:
+            files = self.scan()
+            if files == self.snapshot:
+                pending = None
+            elif files == pending:
+                paths = self.changed_paths(files)
+                logger.info("Detected %s new, changed or removed statements", len(paths))
+                on_change(paths)
+                self.snapshot = files
+                pending = None
+                batches += 1
+                continue
+            else:
+                # Wait one more interval to make sure the files have stopped changing
+                pending = files
+            time.sleep(self.interval)
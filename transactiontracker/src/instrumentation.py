@@ -0,0 +1,122 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logger import setup_logger
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = setup_logger(__name__)
+
+# Counters kept for every stage, summed over all the times the stage runs
+STAGE_COUNTERS = ['calls', 'seconds', 'rows', 'bytes_read', 'bytes_written', 'tokens_in', 'tokens_out', 'tokens_cached']
+
+class Stage:
+    """Counters for one timed run of a stage, filled in by the code being measured"""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.tokens_cached = 0
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children, in MB"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(max(own, children), 1)
+
+class RunReport:
+    """
+    Per-stage wall time and throughput for one pipeline run.
+
+    Stages are named like 'parse.StandardCharteredAccountParser' or 'export.csv'. Each keeps
+    totals of its calls, seconds, rows, bytes and Gemini tokens, and the report is written
+    as JSON alongside the run's output. Safe to record from several threads.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block of code, yielding a Stage for it to fill in rows, bytes and tokens"""
+        stage = Stage()
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            self.record(name, time.perf_counter() - start, **vars(stage))
+
+    def record(self, name, seconds, calls=1, **counters):
+        """Add one measurement (or a merged set of them) to a stage's totals"""
+        with self.lock:
+            totals = self.stages.setdefault(name, dict.fromkeys(STAGE_COUNTERS, 0))
+            totals['calls'] += calls
+            totals['seconds'] += seconds
+            for counter, value in counters.items():
+                totals[counter] += value or 0
+
+    def merge(self, stages):
+        """Add stage totals recorded elsewhere, e.g. in a worker process"""
+        for name, totals in stages.items():
+            self.record(name, **totals)
+
+    def to_dict(self):
+        with self.lock:
+            stages = {}
+            for name, totals in self.stages.items():
+                stages[name] = dict(totals, seconds=round(totals['seconds'], 4))
+                if totals['rows'] and totals['seconds'] > 0:
+                    stages[name]['rows_per_sec'] = round(totals['rows'] / totals['seconds'], 1)
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall_seconds': round((datetime.now() - self.started_at).total_seconds(), 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': stages,
+        }
+
+    def write(self, output_dir, filename='run_report.json'):
+        """Write the report as JSON in output_dir and return its path"""
+        os.makedirs(output_dir, exist_ok=True)
+        report_path = os.path.join(output_dir, filename)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        logger.info("Wrote run report to %s", report_path)
+        return report_path
+
+# Report for the current run, shared by every instrumented module
+report = RunReport()
+
+def stage(name):
+    """Time a block of code against the current run report"""
+    return report.stage(name)
+
+@contextmanager
+def capture():
+    """
+    Record into a fresh report for the duration of the block, yielding it.
+
+    Used around work that may run in a worker process, whose stages are returned to
+    the parent and merged into its report.
+    """
+    global report
+    previous, report = report, RunReport()
+    try:
+        yield report
+    finally:
+        report = previous
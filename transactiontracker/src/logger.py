@@ -1,48 +1,175 @@
+import atexit
+import hashlib
 import logging
-import os
-from logging.handlers import RotatingFileHandler
+import multiprocessing
+import queue
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from config import config
 
+# Handlers shared by every logger, the file and console handlers that do the writing,
+# and the listener feeding them in queue mode
+_handlers = None
+_targets = None
+_listener = None
+
+def _build_handlers(log_level):
+    """Create the rotating file and console handlers"""
+    # Get log format from config or use defaults
+    file_format = config.get('logging.format',
+        '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+    )
+    console_format = '%(asctime)s - %(levelname)s - %(message)s'
+
+    # File handler (rotating log files, max 5MB each, keep 5 backup files)
+    log_file = config.logs_dir / 'transaction_tracker.log'
+    file_handler = RotatingFileHandler(
+        str(log_file),
+        maxBytes=5*1024*1024,
+        backupCount=5
+    )
+    file_handler.setFormatter(logging.Formatter(file_format))
+    file_handler.setLevel(log_level)
+
+    # Console handler
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(console_format))
+    console_handler.setLevel(log_level)
+
+    return [file_handler, console_handler]
+
+def _shared_handlers(log_level):
+    """
+    Handlers attached to every logger, created once per process.
+
+    With logging.queue enabled (the default) loggers only put records on an in-memory
+    queue, and a QueueListener thread does the file and console I/O off the hot path.
+    """
+    global _handlers, _targets, _listener
+    if _handlers is None:
+        _targets = _build_handlers(log_level)
+        if config.get('logging.queue', True):
+            log_queue = queue.SimpleQueue()
+            _listener = QueueListener(log_queue, *_targets, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop_logging)
+            _handlers = [QueueHandler(log_queue)]
+        else:
+            _handlers = _targets
+    return _handlers
+
+def stop_logging():
+    """Write out any queued records and stop the queue listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+@contextmanager
+def worker_logging():
+    """
+    Forward log records from worker processes to this process's file and console handlers.
+
+    Yields the initializer and initargs to create a process pool with. Workers then only
+    put records on a multiprocessing queue, so this process alone writes and rotates the
+    log file.
+    """
+    configure_logging()
+    log_queue = multiprocessing.Queue()
+    listener = QueueListener(log_queue, *_targets, respect_handler_level=True)
+    listener.start()
+    try:
+        yield _forward_to_parent, (log_queue,)
+    finally:
+        listener.stop()
+
+def _forward_to_parent(log_queue):
+    """Worker initializer: replace the handlers inherited from the parent with a queue to it"""
+    global _handlers, _listener
+    inherited = _handlers or []
+    _handlers = [QueueHandler(log_queue)]
+    # The parent's listener thread doesn't exist in this process
+    _listener = None
+    for logger in list(logging.Logger.manager.loggerDict.values()):
+        if isinstance(logger, logging.Logger) and any(handler in inherited for handler in logger.handlers):
+            logger.handlers = [handler for handler in logger.handlers if handler not in inherited] + _handlers
+
+class DeferredHandler(logging.Handler):
+    """
+    Placeholder handler that configures logging when the first record arrives.
+
+    Lets modules call setup_logger at import without reading config.yaml, so importing
+    the application stays cheap until something is actually logged.
+    """
+
+    def handle(self, record):
+        configure_logging()
+        # Hand the record straight to the real handlers; going through logger.handle again
+        # would reach them a second time from the caller's own pass over the handlers
+        if logging.getLogger(record.name).isEnabledFor(record.levelno):
+            for handler in _handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+        return True
+
+    def emit(self, record):
+        pass
+
+_deferred_handler = DeferredHandler()
+# Loggers set up since logging was last configured, still holding the deferred handler
+_pending_loggers = []
+_configure_lock = threading.Lock()
+
+def configure_logging():
+    """Read the logging settings and give every logger set up so far the real handlers"""
+    with _configure_lock:
+        if _handlers is not None and not _pending_loggers:
+            return
+        # Get log level from config, default to INFO
+        log_level = getattr(logging, config.get('logging.level', 'INFO'))
+        handlers = _shared_handlers(log_level)
+        while _pending_loggers:
+            logger = _pending_loggers.pop()
+            logger.setLevel(log_level)
+            # Swap in a new list, as Logger.callHandlers may be iterating the old one
+            logger.handlers = [handler for handler in logger.handlers if handler is not _deferred_handler] + handlers
+
 def setup_logger(name):
     """
     Set up a logger with consistent formatting and handlers.
     Logs will be written to both console and a rotating file.
+
+    The level and handlers are read from config.yaml when the first record is logged.
     """
     logger = logging.getLogger(name)
-    
+
     # Only set up handlers if they haven't been set up already
     if not logger.handlers:
-        # Get log level from config, default to INFO
-        log_level = getattr(logging, config.get('logging.level', 'INFO'))
-        logger.setLevel(log_level)
-
-        # Get log format from config or use defaults
-        file_format = config.get('logging.format',
-            '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
-        )
-        console_format = '%(asctime)s - %(levelname)s - %(message)s'
-
-        # Create formatters
-        file_formatter = logging.Formatter(file_format)
-        console_formatter = logging.Formatter(console_format)
-
-        # File handler (rotating log files, max 5MB each, keep 5 backup files)
-        log_file = config.logs_dir / 'transaction_tracker.log'
-        file_handler = RotatingFileHandler(
-            str(log_file),
-            maxBytes=5*1024*1024,
-            backupCount=5
-        )
-        file_handler.setFormatter(file_formatter)
-        file_handler.setLevel(log_level)
-
-        # Console handler
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(console_formatter)
-        console_handler.setLevel(log_level)
-
-        # Add handlers to logger
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        with _configure_lock:
+            # Everything reaches the deferred handler until the configured level is known
+            logger.setLevel(logging.DEBUG)
+            logger.addHandler(_deferred_handler)
+            _pending_loggers.append(logger)
+        if _handlers is not None:
+            configure_logging()
 
     return logger
+
+class Payload:
+    """
+    Log argument for a prompt or response body.
+
+    Formats as the full text when logging.log_payloads is enabled, otherwise as its
+    size and a short hash. Either way the work is only done if the record is emitted.
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        text = '' if self.text is None else str(self.text)
+        if config.get('logging.log_payloads', False):
+            return text
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+        return f"<{len(text)} chars, sha256 {digest}>"
@@ -1,8 +1,15 @@
 from config import config  # Import the config instance instead of the module
 import functions 
-import ai_functions
+import instrumentation
+import fx_rates
+import argparse
+import cProfile
 import os
-import pandas as pd 
+import sys
+from ingestion_manifest import IngestionManifest
+from transaction_store import TransactionStore
+from rollups import SpendRollups
+from input_watcher import InputWatcher
 from logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -11,74 +18,101 @@ def process_transactions():
     """Main function to process all transaction files"""
     logger.info("Starting transaction processing")
     
-    all_transactions = pd.DataFrame()
+    # Only new or changed statements are parsed, everything else comes from the store
+    manifest = IngestionManifest(os.path.join(config.store_dir, 'manifest.json'))
+    store = TransactionStore(config.store_dir)
     
-    # Process each file in the input directory
-    for filename in os.listdir(config.input_dir):
-        file_path = os.path.join(config.input_dir, filename)
-        if os.path.isfile(file_path):
-            logger.info(f"Processing file: {filename}")
-            try:
-                transactions_df = functions.process_transactions(file_path)
-                if not transactions_df.empty:
-                    all_transactions = pd.concat([all_transactions, transactions_df], ignore_index=True)
-                    logger.info(f"Successfully processed {len(transactions_df)} transactions from {filename}")
-                else:
-                    logger.warning(f"No transactions found in {filename}")
-            except Exception as e:
-                logger.error(f"Error processing {filename}: {str(e)}", exc_info=True)
-    
-    if not all_transactions.empty:
-        # Save to CSV file
-        output_file = os.path.join(config.output_dir, "combined_transactions.csv")
-        all_transactions.to_csv(output_file, index=False)
-        logger.info(f"Saved {len(all_transactions)} transactions to {output_file}")
-        
-        # Save to Excel file
-        output_file_excel = os.path.join(config.output_dir, "combined_transactions.xlsx")
-        all_transactions.to_excel(output_file_excel, index=False)
-        logger.info(f"Saved {len(all_transactions)} transactions to {output_file_excel}")
-
-        # Print out some stats
-        logger.info(f"Transaction DataFrame stats: \n{all_transactions.info()}")
-    else:
+    file_paths = [os.path.join(config.input_dir, filename) for filename in os.listdir(config.input_dir)]
+    file_paths = [file_path for file_path in file_paths if os.path.isfile(file_path)]
+    
+    workers = config.get('ingestion.workers', 1)
+    streaming_threshold_mb = config.get('ingestion.streaming_threshold_mb')
+    with instrumentation.stage('ingest'):
+        changes = functions.ingest_files(
+            file_paths, manifest, store, workers,
+            streaming_threshold_bytes=streaming_threshold_mb * 1024 * 1024 if streaming_threshold_mb is not None else None,
+            chunksize=config.get('ingestion.chunksize', 100000)
+        )
+    with instrumentation.stage('store_read') as stage:
+        all_transactions = store.read(manifest.hashes(), deduplicate=config.get('ingestion.deduplicate', True))
+        stage.rows = len(all_transactions)
+    
+    if all_transactions.empty:
         logger.warning("No transactions were processed successfully")
+        return all_transactions
+    
+    logger.info("Transaction store holds %s transactions in %s", len(all_transactions), config.store_dir)
+    
+    all_transactions = normalize_currency(all_transactions)
+    
+    # CSV/Excel copies are optional, and only rewritten when the store changed
+    formats = config.get('export.formats', [])
+    stale = [fmt for fmt in formats
+             if not os.path.exists(os.path.join(config.output_dir, f"combined_transactions.{fmt}"))]
+    if changes or stale:
+        functions.export_transactions(all_transactions, "combined_transactions", formats, config.output_dir)
+    elif formats:
+        logger.info("No new or changed statements, combined exports are up to date")
     
     return all_transactions
 
-def categorize_transactions(transactions_df=None):
-    """Use Gemini to categorize transactions"""
+def normalize_currency(transactions_df):
+    """Add reporting-currency amounts, so cross-account totals use one currency; skipped without a rate file"""
+    with instrumentation.stage('fx') as stage:
+        rates = fx_rates.open_fx_rates()
+        if rates is None:
+            return transactions_df
+        stage.rows = len(transactions_df)
+        return fx_rates.normalize_currency(transactions_df, rates, fx_rates.reporting_currency())
+
+def read_transactions():
+    """Read every stored transaction with reporting-currency amounts, as process_transactions returns them"""
+    manifest = IngestionManifest(os.path.join(config.store_dir, 'manifest.json'))
+    store = TransactionStore(config.store_dir)
+    transactions_df = store.read(manifest.hashes(), deduplicate=config.get('ingestion.deduplicate', True))
+    if not transactions_df.empty:
+        transactions_df = normalize_currency(transactions_df)
+    return transactions_df
+
+def export_transactions(formats=('csv', 'xlsx')):
+    """Export the combined transactions from the store on demand"""
+    transactions_df = read_transactions()
+    return functions.export_transactions(transactions_df, "combined_transactions",
+                                         formats, config.output_dir)
+
+def categorize_transactions(transactions_df=None, categoriser=None):
+    """Use Gemini to categorize transactions, optionally reusing a long-lived GeminiCategoriser"""
     logger.info("Starting transaction categorization with Gemini")
+    # Imported here so ingest-only runs don't pay for the AI dependencies
+    import ai_functions
     
     if transactions_df is None:
-        # If no DataFrame is provided, use a separate input file
-        logger.info("No DataFrame provided, using test data csv")
-        print("📊 Using test data for categorization...")
-        categorized_df = ai_functions.initial_gemini_csv_categorisation()
-    else:
-        # If a DataFrame is provided, save it to a temporary file and process it
-        logger.info(f"Processing provided DataFrame with {len(transactions_df)} transactions")
-        print(f"📊 Processing {len(transactions_df)} transactions...")
-        
-        # Limit the number of transactions if needed
-        max_rows = 50
-        if len(transactions_df) > max_rows:
-            print(f"⚠️ Limiting to {max_rows} transactions to prevent response truncation")
-            transactions_df = transactions_df.head(max_rows)
-        
-        temp_file = os.path.join(config.output_dir, "temp_transactions.csv")
-        transactions_df.to_csv(temp_file, index=False)
-        categorized_df = ai_functions.initial_gemini_csv_categorisation(temp_file)
-        
-        # Clean up temporary file
-        try:
-            os.remove(temp_file)
-        except Exception as e:
-            logger.warning(f"Failed to remove temporary file: {str(e)}")
+        # If no DataFrame is provided, read the store the same way ingestion does, so the
+        # categorised output has the same columns whichever command produced it
+        logger.info("No DataFrame provided, reading transactions from the store")
+        transactions_df = read_transactions()
+    
+    logger.info("Processing %s transactions", len(transactions_df))
+    print(f"📊 Processing {len(transactions_df)} transactions...")
     
+    with instrumentation.stage('categorise') as stage:
+        stage.rows = len(transactions_df)
+        categorized_df = ai_functions.gemini_dataframe_categorisation(transactions_df, categoriser)
+    
+    if categorized_df is not None:
+        update_rollups(categorized_df)
     return categorized_df
 
-if __name__ == "__main__":
+def update_rollups(categorized_df):
+    """Bring the spend rollups in line with the full categorised history"""
+    with instrumentation.stage('rollups') as stage:
+        rollups = SpendRollups(os.path.join(config.store_dir, 'rollups'))
+        added, removed = rollups.sync(categorized_df)
+        stage.rows = added + removed
+    return rollups
+
+def run_interactive():
+    """Ingest statements, then offer categorization, export and chat"""
     logger.info("Transaction Tracker application starting")
     print("🚀 Transaction Tracker application starting...")
     
@@ -96,7 +130,7 @@ if __name__ == "__main__":
             try:
                 categorized_df = categorize_transactions(transactions_df)
                 if categorized_df is not None:
-                    logger.info(f"Successfully categorized {len(categorized_df)} transactions")
+                    logger.info("Successfully categorized %s transactions", len(categorized_df))
                     print(f"\n✅ Successfully categorized {len(categorized_df)} transactions!")
                     
                     # Display sample of categorized transactions
@@ -106,20 +140,121 @@ if __name__ == "__main__":
                         sample_cols = [col for col in sample_cols if col in categorized_df.columns]
                         print(categorized_df[sample_cols].head().to_string(index=False))
                     
-                    output_file = os.path.join(config.output_dir, "categorized_transactions.csv")
+                    output_file = os.path.join(config.output_dir, "categorized_transactions.parquet")
                     print(f"\n💾 Saved categorized transactions to: {output_file}")
                 else:
                     logger.warning("Transaction categorization failed")
                     print("❌ Transaction categorization failed. Check the logs for details.")
             except Exception as e:
-                logger.error(f"Error during categorization: {str(e)}", exc_info=True)
+                logger.error("Error during categorization: %s", e, exc_info=True)
                 print(f"❌ Error during categorization: {str(e)}")
     
+    # Ask user if they want CSV/Excel copies of the combined transactions
+    if not transactions_df.empty:
+        user_input = input("\n📤 Do you want to export the combined transactions to CSV and Excel? (y/n): ")
+        if user_input.lower() == 'y':
+            for output_file in export_transactions():
+                print(f"💾 Saved combined transactions to: {output_file}")
+    
     # Ask user if they want to chat with Gemini
     user_input = input("\n💬 Do you want to chat with the Gemini AI assistant? (y/n): ")
     if user_input.lower() == 'y':
         logger.info("Starting Gemini chat")
+        import ai_functions
         ai_functions.initial_gemini_chat()
     
     logger.info("Transaction Tracker application completed")
     print("\n🎉 Transaction Tracker application completed. Thank you for using the service!")
+
+def watch_input_dir(interval=None, categorize=False, max_batches=None):
+    """
+    Ingest statements as they arrive in input_dir, optionally categorizing them too.
+
+    Runs in one long-lived process, so config, parsers and the Gemini client are set up
+    once rather than on every batch. The run report is rewritten after each batch.
+    """
+    if interval is None:
+        interval = config.get('watch.poll_interval_seconds', 2)
+    categoriser = None
+    if categorize:
+        import ai_functions
+        categoriser = ai_functions.open_gemini_categoriser()
+        if categoriser is None:
+            logger.warning("Watching without categorization")
+    
+    def on_change(paths):
+        try:
+            transactions_df = process_transactions()
+            if categoriser is not None and not transactions_df.empty:
+                categorize_transactions(transactions_df, categoriser)
+        except Exception as e:
+            # A bad statement shouldn't stop the watcher; it is retried when the file changes
+            logger.error("Error processing %s: %s", paths, e, exc_info=True)
+        instrumentation.report.write(config.output_dir)
+    
+    watcher = InputWatcher(config.input_dir, interval)
+    try:
+        watcher.run(on_change, max_batches=max_batches)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching %s", config.input_dir)
+    finally:
+        if categoriser is not None:
+            categoriser.close()
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Transaction Tracker. Without a command, runs the interactive prompts.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Write cProfile stats for the run to output_dir/profile.pstats")
+    commands = parser.add_subparsers(dest='command')
+    
+    commands.add_parser('ingest', help="Parse new or changed statements into the transaction store")
+    commands.add_parser('categorize', help="Categorize the stored transactions with the rules, cache and Gemini")
+    
+    export_parser = commands.add_parser('export', help="Write the combined transactions as CSV and/or Excel")
+    export_parser.add_argument('--formats', nargs='+', default=['csv', 'xlsx'], choices=['csv', 'xlsx'],
+                               help="Formats to write (default: csv xlsx)")
+    
+    watch_parser = commands.add_parser('watch', help="Ingest statements as they arrive in input_dir")
+    watch_parser.add_argument('--interval', type=float,
+                              help="Seconds between polls (default: watch.poll_interval_seconds)")
+    watch_parser.add_argument('--categorize', action='store_true',
+                              default=None, help="Also categorize after each batch (default: watch.categorize)")
+    return parser
+
+def run_command(args):
+    """Run a CLI command without prompting, returning the process exit code"""
+    if args.command == 'ingest':
+        process_transactions()
+    elif args.command == 'categorize':
+        if categorize_transactions() is None:
+            return 1
+    elif args.command == 'export':
+        for output_file in export_transactions(args.formats):
+            print(f"💾 Saved combined transactions to: {output_file}")
+    elif args.command == 'watch':
+        categorize = args.categorize if args.categorize is not None else config.get('watch.categorize', False)
+        watch_input_dir(args.interval, categorize)
+    else:
+        run_interactive()
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        return run_command(args)
+    finally:
+        if profiler:
+            profiler.disable()
+            stats_path = os.path.join(config.output_dir, 'profile.pstats')
+            profiler.dump_stats(stats_path)
+            print(f"📈 Saved profile to: {stats_path}")
+        # Per-stage timings, throughput, tokens and peak memory for this run
+        instrumentation.report.write(config.output_dir)
+
+if __name__ == "__main__":
+    sys.exit(main())
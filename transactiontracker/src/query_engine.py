@@ -0,0 +1,195 @@
+import os
+import pandas as pd
+import fx_rates
+from logger import setup_logger
+from config import config
+
+logger = setup_logger(__name__)
+
+# Most rows any one tool call sends back to the model
+MAX_RESULT_ROWS = 50
+
+# Columns returned for individual transactions
+TRANSACTION_COLUMNS = ['Date', 'Account Number', 'Transaction', 'Currency', 'Deposit', 'Withdrawal',
+                       'Reporting Deposit', 'Reporting Withdrawal', 'Category', 'Sub-Category']
+
+# Columns summaries can be grouped by
+GROUP_COLUMNS = {
+    'month': 'Month',
+    'category': 'Category',
+    'sub_category': 'Sub-Category',
+    'account': 'Account Number',
+    'currency': 'Currency',
+}
+
+_FILTER_PARAMETERS = {
+    'start_date': {'type': 'string', 'description': 'Earliest transaction date, YYYY-MM-DD'},
+    'end_date': {'type': 'string', 'description': 'Latest transaction date, YYYY-MM-DD'},
+    'category': {'type': 'string', 'description': 'Only this Category'},
+    'sub_category': {'type': 'string', 'description': 'Only this Sub-Category'},
+    'account': {'type': 'string', 'description': 'Only this Account Number'},
+    'description_contains': {'type': 'string', 'description': 'Case-insensitive text the description must contain'},
+}
+
+# Function declarations passed to Gemini as tools, in the OpenAPI subset the API accepts
+TOOL_DECLARATIONS = [
+    {
+        'name': 'summarise_spending',
+        'description': "Total deposits and withdrawals, transaction counts and average amounts, "
+                       "grouped and filtered. Use for questions like 'what did I spend on Food in March'.",
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'group_by': {'type': 'array', 'items': {'type': 'string', 'enum': list(GROUP_COLUMNS)},
+                             'description': 'Columns to group by, e.g. ["month", "category"]'},
+                **_FILTER_PARAMETERS,
+            },
+        },
+    },
+    {
+        'name': 'find_transactions',
+        'description': f"Individual transactions matching the filters, largest withdrawals first, "
+                       f"at most {MAX_RESULT_ROWS}.",
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                **_FILTER_PARAMETERS,
+                'min_amount': {'type': 'number', 'description': 'Smallest deposit or withdrawal amount'},
+                'limit': {'type': 'integer', 'description': f'Rows to return, at most {MAX_RESULT_ROWS}'},
+            },
+        },
+    },
+    {
+        'name': 'list_categories',
+        'description': 'The categories, sub-categories and accounts present in the data, with date range.',
+    },
+]
+
+def _records(df):
+    """JSON-friendly list of row dicts: dates as ISO strings, missing values as None"""
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].round(2)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient='records')
+
+class TransactionQueryEngine:
+    """
+    Local filters and aggregations over the transactions, exposed to Gemini as tools.
+
+    The model only ever sees the small result of a call, never the history itself.
+    """
+
+    def __init__(self, transactions_df):
+        df = transactions_df.copy()
+        for col in ['Category', 'Sub-Category']:
+            if col not in df.columns:
+                df[col] = None
+        df['Month'] = df['Date'].dt.strftime('%Y-%m')
+        self.transactions = df
+
+        # Totals and amount filters use the reporting-currency amounts when currency
+        # normalization added them, so sums across accounts stay in one currency
+        if {'Reporting Deposit', 'Reporting Withdrawal'} <= set(df.columns):
+            self.deposit_column, self.withdrawal_column = 'Reporting Deposit', 'Reporting Withdrawal'
+            self.amounts_in = fx_rates.reporting_currency()
+        else:
+            self.deposit_column, self.withdrawal_column = 'Deposit', 'Withdrawal'
+            self.amounts_in = 'the currency of each transaction'
+        self.tools = {
+            'summarise_spending': self.summarise_spending,
+            'find_transactions': self.find_transactions,
+            'list_categories': self.list_categories,
+        }
+
+    @classmethod
+    def from_outputs(cls):
+        """Load the categorised transactions if there are any, otherwise the combined store"""
+        categorized_file = os.path.join(config.output_dir, 'categorized_transactions.parquet')
+        if os.path.exists(categorized_file):
+            logger.info("Chat queries read %s", categorized_file)
+            return cls(pd.read_parquet(categorized_file))
+
+        from ingestion_manifest import IngestionManifest
+        from transaction_store import TransactionStore
+        logger.info("No categorised transactions yet, chat queries read the transaction store")
+        manifest = IngestionManifest(os.path.join(config.store_dir, 'manifest.json'))
+        transactions_df = TransactionStore(config.store_dir).read(manifest.hashes())
+        rates = fx_rates.open_fx_rates()
+        if rates is not None and not transactions_df.empty:
+            transactions_df = fx_rates.normalize_currency(transactions_df, rates, fx_rates.reporting_currency())
+        return cls(transactions_df)
+
+    def call(self, name, args):
+        """Run a tool by name, returning its result or an error the model can read"""
+        tool = self.tools.get(name)
+        if tool is None:
+            return {'error': f"Unknown function {name}"}
+        try:
+            return tool(**args)
+        except (TypeError, ValueError, KeyError) as e:
+            logger.warning("Chat tool %s failed with %s: %s", name, args, e)
+            return {'error': str(e)}
+
+    def _filter(self, start_date=None, end_date=None, category=None, sub_category=None,
+                account=None, description_contains=None):
+        df = self.transactions
+        mask = pd.Series(True, index=df.index)
+        if start_date:
+            mask &= df['Date'] >= pd.Timestamp(start_date)
+        if end_date:
+            mask &= df['Date'] <= pd.Timestamp(end_date)
+        for column, value in [('Category', category), ('Sub-Category', sub_category), ('Account Number', account)]:
+            if value:
+                mask &= df[column].astype('string').str.casefold() == value.casefold()
+        if description_contains:
+            mask &= df['Transaction'].astype('string').str.contains(description_contains, case=False, regex=False)
+        return df[mask.fillna(False)]
+
+    def summarise_spending(self, group_by=('category',), **filters):
+        columns = [GROUP_COLUMNS[key] for key in group_by]
+        df = self._filter(**filters)
+        if not columns:
+            df = df.assign(All='all')
+            columns = ['All']
+
+        summary = df.groupby(columns, dropna=False, observed=True).agg(
+            deposits=(self.deposit_column, 'sum'),
+            withdrawals=(self.withdrawal_column, 'sum'),
+            transactions=('Transaction', 'size'),
+            average_withdrawal=(self.withdrawal_column, 'mean'),
+        ).reset_index().sort_values('withdrawals', ascending=False)
+
+        return {
+            'groups': _records(summary.head(MAX_RESULT_ROWS)),
+            'total_groups': len(summary),
+            'matching_transactions': len(df),
+            'amounts_in': self.amounts_in,
+        }
+
+    def find_transactions(self, min_amount=None, limit=20, **filters):
+        df = self._filter(**filters)
+        if min_amount is not None:
+            df = df[(df[self.withdrawal_column] >= min_amount) | (df[self.deposit_column] >= min_amount)]
+
+        limit = max(1, min(int(limit), MAX_RESULT_ROWS))
+        rows = df.sort_values([self.withdrawal_column, 'Date'], ascending=[False, False]).head(limit)
+        return {
+            'transactions': _records(rows[[col for col in TRANSACTION_COLUMNS if col in rows.columns]]),
+            'matching_transactions': len(df),
+            'amounts_in': self.amounts_in,
+        }
+
+    def list_categories(self):
+        df = self.transactions
+        categories = (df.dropna(subset=['Category']).groupby('Category', observed=True)['Sub-Category']
+                      .apply(lambda values: sorted(values.dropna().astype(str).unique())))
+        return {
+            'categories': {category: subs for category, subs in categories.items()},
+            'accounts': sorted(df['Account Number'].dropna().astype(str).unique()),
+            'first_date': df['Date'].min().strftime('%Y-%m-%d') if len(df) else None,
+            'last_date': df['Date'].max().strftime('%Y-%m-%d') if len(df) else None,
+        }
@@ -0,0 +1,194 @@
+import os
+import pandas as pd
+from logger import setup_logger
+from date_parsing import parse_dates
+from deduplication import add_dedup_keys, DEDUP_COLUMNS
+
+logger = setup_logger(__name__)
+
+# Keys every rollup row is grouped by
+ROLLUP_KEYS = ['Month', 'Category', 'Sub-Category', 'Account Number', 'Currency']
+
+# Additive measures, so rollups can be updated by adding and subtracting rows
+ROLLUP_MEASURES = ['Deposit Total', 'Withdrawal Total', 'Transactions', 'Deposits', 'Withdrawals']
+
+# Identifies one categorised row: the transaction's dedup key plus its categories
+CONTRIBUTION_KEY = 'Contribution'
+
+CONTRIBUTION_DTYPES = {
+    CONTRIBUTION_KEY: 'uint64',
+    **{key: 'string' for key in ROLLUP_KEYS},
+    'Deposit Total': 'float64',
+    'Withdrawal Total': 'float64',
+    'Transactions': 'int64',
+    'Deposits': 'int64',
+    'Withdrawals': 'int64',
+}
+
+def empty_contributions():
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in CONTRIBUTION_DTYPES.items()})
+
+def contributions(categorized_df):
+    """
+    Reduce categorised transactions to one slim row each: a contribution key, the rollup
+    keys and the row's measures.
+    """
+    df = categorized_df.reset_index(drop=True)
+    if not set(DEDUP_COLUMNS).issubset(df.columns):
+        df = add_dedup_keys(df)
+
+    keys = pd.DataFrame({
+        'Row Hash': df['Row Hash'],
+        'Occurrence': df['Occurrence'],
+        'Category': df['Category'].astype('string'),
+        'Sub-Category': df['Sub-Category'].astype('string'),
+    })
+    deposit = pd.to_numeric(df['Deposit'], errors='coerce')
+    withdrawal = pd.to_numeric(df['Withdrawal'], errors='coerce')
+    return pd.DataFrame({
+        CONTRIBUTION_KEY: pd.util.hash_pandas_object(keys, index=False).to_numpy(),
+        'Month': parse_dates(df['Date']).dt.strftime('%Y-%m').astype('string'),
+        'Category': df['Category'].astype('string'),
+        'Sub-Category': df['Sub-Category'].astype('string'),
+        'Account Number': df['Account Number'].astype('string'),
+        'Currency': df['Currency'].astype('string'),
+        'Deposit Total': deposit.fillna(0.0),
+        'Withdrawal Total': withdrawal.fillna(0.0),
+        'Transactions': 1,
+        'Deposits': deposit.notna().astype('int64'),
+        'Withdrawals': withdrawal.notna().astype('int64'),
+    }).astype(CONTRIBUTION_DTYPES)
+
+def aggregate(contributions_df):
+    """Group contributions into rollup rows"""
+    return (contributions_df.groupby(ROLLUP_KEYS, dropna=False, sort=False)[ROLLUP_MEASURES]
+            .sum()
+            .reset_index())
+
+class SpendRollups:
+    """
+    Materialized Deposit/Withdrawal totals, counts and averages by month, category,
+    sub-category, account and currency.
+
+    Alongside the rollups, a ledger records which categorised rows have been counted, as
+    Parquet part files. There are two ways to keep the rollups current:
+
+    - add(new_rows) folds in just-categorised rows. It only hashes those rows and
+      appends one ledger part, so its cost follows the size of the batch.
+    - sync(all_rows) treats its argument as the complete categorised history. Rows
+      missing from it are subtracted and re-categorised rows are moved.
+
+    Queries read the small rollup table only.
+    """
+
+    def __init__(self, rollup_dir):
+        self.rollup_dir = str(rollup_dir)
+        self.rollups_path = os.path.join(self.rollup_dir, 'rollups.parquet')
+        self.ledger_dir = os.path.join(self.rollup_dir, 'ledger')
+        os.makedirs(self.ledger_dir, exist_ok=True)
+
+        self.rollups = (pd.read_parquet(self.rollups_path) if os.path.exists(self.rollups_path)
+                        else aggregate(empty_contributions()))
+
+    def _ledger_parts(self):
+        return sorted(os.path.join(self.ledger_dir, name) for name in os.listdir(self.ledger_dir)
+                      if name.endswith('.parquet'))
+
+    def read_ledger(self, columns=None):
+        """Every counted contribution, or just the given columns of them"""
+        columns = columns or list(CONTRIBUTION_DTYPES)
+        parts = self._ledger_parts()
+        if not parts:
+            return empty_contributions()[columns]
+        ledger = pd.concat([pd.read_parquet(part, columns=columns) for part in parts], ignore_index=True)
+        return ledger.astype({col: CONTRIBUTION_DTYPES[col] for col in columns})
+
+    def _write_ledger_part(self, contributions_df):
+        part = len(self._ledger_parts())
+        contributions_df.to_parquet(os.path.join(self.ledger_dir, f"part-{part:06d}.parquet"), index=False)
+
+    def _apply(self, added, removed):
+        """Add the added contributions to the rollups and subtract the removed ones"""
+        subtracted = aggregate(removed)
+        subtracted[ROLLUP_MEASURES] = -subtracted[ROLLUP_MEASURES]
+        rollups = aggregate(pd.concat([self.rollups, aggregate(added), subtracted], ignore_index=True))
+        self.rollups = rollups[rollups['Transactions'] > 0].reset_index(drop=True)
+        self.rollups.to_parquet(self.rollups_path, index=False)
+
+    def add(self, categorized_rows):
+        """
+        Fold newly categorised rows into the rollups.
+
+        Rows already counted are skipped, so a batch can safely be added twice.
+
+        Returns:
+            int: Rows added.
+        """
+        new = contributions(categorized_rows)
+        new = new[new['Category'].notna()].drop_duplicates(CONTRIBUTION_KEY)
+        known = self.read_ledger([CONTRIBUTION_KEY])[CONTRIBUTION_KEY]
+        new = new[~new[CONTRIBUTION_KEY].isin(known)]
+        if new.empty:
+            logger.info("Rollups already include these rows")
+            return 0
+
+        self._apply(new, empty_contributions())
+        self._write_ledger_part(new)
+        logger.info("Added %s categorised rows to the rollups", len(new))
+        return len(new)
+
+    def sync(self, categorized_df):
+        """
+        Bring the rollups in line with the complete set of categorised transactions.
+
+        Any counted row missing from categorized_df is subtracted, so pass the whole
+        categorised history, not a batch; use add() for batches. The full history is
+        hashed and the ledger rewritten as a single part.
+
+        Returns:
+            tuple: (rows added, rows removed) since the last update.
+        """
+        current = contributions(categorized_df)
+        current = current[current['Category'].notna()]
+        ledger = self.read_ledger()
+
+        known = set(ledger[CONTRIBUTION_KEY])
+        latest = set(current[CONTRIBUTION_KEY])
+        added = current[~current[CONTRIBUTION_KEY].isin(known)]
+        removed = ledger[~ledger[CONTRIBUTION_KEY].isin(latest)]
+        if added.empty and removed.empty:
+            logger.info("Rollups are up to date")
+            return 0, 0
+
+        # Removed or re-categorised rows are subtracted from their old rollup rows
+        self._apply(added, removed)
+        ledger = pd.concat([ledger[ledger[CONTRIBUTION_KEY].isin(latest)], added], ignore_index=True)
+        for part in self._ledger_parts():
+            os.remove(part)
+        self._write_ledger_part(ledger)
+        logger.info("Synced rollups with %s new and %s removed categorised rows", len(added), len(removed))
+        return len(added), len(removed)
+
+    def query(self, group_by=('Month', 'Category'), months=None, categories=None, accounts=None, currencies=None):
+        """
+        Totals, counts and averages from the rollups.
+
+        Args:
+            group_by (sequence): Rollup keys to group the result by.
+            months, categories, accounts, currencies (list, optional): Only include these values,
+                e.g. months=['2024-01', '2024-02'].
+
+        Returns:
+            pd.DataFrame: One row per group with the rollup measures plus 'Average Deposit'
+            and 'Average Withdrawal'.
+        """
+        rollups = self.rollups
+        for column, values in [('Month', months), ('Category', categories),
+                               ('Account Number', accounts), ('Currency', currencies)]:
+            if values is not None:
+                rollups = rollups[rollups[column].isin(values)]
+
+        result = rollups.groupby(list(group_by), dropna=False)[ROLLUP_MEASURES].sum().reset_index()
+        result['Average Deposit'] = result['Deposit Total'] / result['Deposits'].where(result['Deposits'] > 0)
+        result['Average Withdrawal'] = result['Withdrawal Total'] / result['Withdrawals'].where(result['Withdrawals'] > 0)
+        return result
@@ -0,0 +1,62 @@
+import re
+import pandas as pd
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class RuleClassifier:
+    """
+    Deterministic categoriser for descriptions that don't need an LLM.
+
+    All rule phrases are compiled into a single alternation regex and matched against the
+    whole description column in one vectorized str.extract pass. Phrases are tried longest
+    first, so 'PAYNOW-GRABFOOD' wins over 'GRAB' where both match at the same position.
+    """
+
+    def __init__(self, rules):
+        """
+        Args:
+            rules (list): (phrase, category, subcategory) tuples in priority order. When the same
+                phrase appears twice, the first rule wins.
+        """
+        self.categories = {}
+        for phrase, category, subcategory in rules:
+            phrase = str(phrase).strip().upper()
+            if phrase:
+                self.categories.setdefault(phrase, (category, subcategory))
+
+        self.pattern = None
+        if self.categories:
+            alternation = '|'.join(re.escape(phrase) for phrase in sorted(self.categories, key=len, reverse=True))
+            # Only match at the start of a word, so 'GRAB' doesn't fire inside an unrelated word
+            self.pattern = re.compile(f"(?<![A-Z0-9])({alternation})")
+
+        logger.debug("Compiled %s categorisation rules", len(self.categories))
+
+    @classmethod
+    def from_config(cls, config):
+        """Build rules from paynow_vendors, external_individuals and keyword_rules in config.yaml"""
+        rules = []
+        for vendor in config.get('paynow_vendors', []) or []:
+            rules.append((vendor['vendor'], vendor['category'], vendor['subcategory']))
+        for individual in config.get('external_individuals', []) or []:
+            rules.append((individual['name'], individual['category'], individual['subcategory']))
+        for keyword in config.get('keyword_rules', []) or []:
+            rules.append((keyword['keyword'], keyword['category'], keyword['subcategory']))
+        return cls(rules)
+
+    def classify(self, descriptions):
+        """
+        Classify a Series of descriptions.
+
+        Returns:
+            pd.DataFrame: 'Category' and 'Sub-Category' aligned with the input, NaN where no rule matched.
+        """
+        if self.pattern is None:
+            return pd.DataFrame({'Category': None, 'Sub-Category': None}, index=descriptions.index)
+
+        matched = descriptions.fillna('').astype(str).str.upper().str.extract(self.pattern, expand=False)
+        return pd.DataFrame({
+            'Category': matched.map({phrase: value[0] for phrase, value in self.categories.items()}),
+            'Sub-Category': matched.map({phrase: value[1] for phrase, value in self.categories.items()}),
+        }, index=descriptions.index)
@@ -1,151 +1,266 @@
 from abc import ABC, abstractmethod
+import io
+import itertools
+import re
 import pandas as pd
 import csv
 from logger import setup_logger
+from date_parsing import infer_date_format, parse_dates
+
+# Standard columns every parser produces, in output order
+STANDARD_COLUMNS = ['Financial Institution', 'Account Name', 'Account Number', 
+                    'Date', 'Transaction', 'Currency', 'Deposit', 'Withdrawal', 
+                    'Running Balance']
+
+# Extra columns some parsers add after the standard ones
+OPTIONAL_COLUMNS = ['Foreign Currency', 'Foreign Amount']
+
+# Free-text columns that get surrounding whitespace stripped
+STRING_COLUMNS = ['Financial Institution', 'Account Name', 'Account Number', 
+                  'Transaction', 'Currency', 'Foreign Currency']
+
+# Low-cardinality columns held as categoricals, which saves memory and speeds up groupbys
+CATEGORICAL_COLUMNS = ['Financial Institution', 'Account Name', 'Currency', 'Foreign Currency']
+
+# Declared dtypes for the combined dataset, so merging statements never upcasts to object
+COLUMN_DTYPES = {
+    'Financial Institution': 'category',
+    'Account Name': 'category',
+    'Account Number': 'string',
+    'Date': 'datetime64[ns]',
+    'Transaction': 'string',
+    'Currency': 'category',
+    'Deposit': 'float64',
+    'Withdrawal': 'float64',
+    'Running Balance': 'float64',
+    'Foreign Currency': 'category',
+    'Foreign Amount': 'float64',
+}
+
+def empty_transactions(columns=STANDARD_COLUMNS):
+    """Empty DataFrame with the declared schema"""
+    return pd.DataFrame({col: pd.Series(dtype=COLUMN_DTYPES[col]) for col in columns})
+
+def align_to_schema(df, columns=STANDARD_COLUMNS, categorical=True):
+    """
+    Return df with exactly the given columns, cast to the declared dtypes.
+
+    Missing columns are added as nulls. Blank strings in numeric and date columns
+    become NaN/NaT rather than forcing the column to object dtype.
+
+    Args:
+        categorical (bool): Cast low-cardinality columns to category. Pass False for frames
+            that are about to be concatenated, since categoricals with different categories
+            concat to object; cast the combined frame afterwards instead.
+    """
+    aligned = {}
+    for col in columns:
+        dtype = COLUMN_DTYPES[col]
+        if dtype == 'category' and not categorical:
+            dtype = 'string'
+        
+        if col not in df.columns:
+            aligned[col] = pd.Series(index=df.index, dtype=dtype)
+        elif dtype == 'float64':
+            aligned[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+        elif dtype.startswith('datetime64'):
+            aligned[col] = parse_dates(df[col]).astype(dtype)
+        elif dtype == 'category':
+            aligned[col] = df[col].astype('string').astype(dtype)
+        else:
+            aligned[col] = df[col].astype(dtype)
+    return pd.DataFrame(aligned, index=df.index)
+
+# Bytes read from the start of a file to work out which parser it needs
+SIGNATURE_SAMPLE_BYTES = 4096
+
+# Parser classes in the order their header signatures are checked
+PARSER_REGISTRY = []
+
+def register_parser(parser_class):
+    """Class decorator that adds a TransactionParser subclass to the registry"""
+    PARSER_REGISTRY.append(parser_class)
+    return parser_class
 
 class TransactionParser(ABC):
+    # Regex matched against the first SIGNATURE_SAMPLE_BYTES of a file to recognise its format
+    header_signature = None
+
     def __init__(self):
         self.logger = setup_logger(self.__class__.__name__)
 
+    @classmethod
+    def matches_header(cls, sample):
+        """Check whether the start of a file looks like this parser's format"""
+        return cls.header_signature is not None and cls.header_signature.search(sample) is not None
+
     @abstractmethod
     def parse_file(self, file_path):
         """Parse the transaction file and return a standardized DataFrame"""
         self.logger.error("parse_file method not implemented")
         raise NotImplementedError("Subclasses must implement parse_file method")
 
+    def parse_file_chunks(self, file_path, chunksize):
+        """
+        Parse the transaction file as a sequence of standardized DataFrames.
+
+        Parsers that can stream override this to keep at most chunksize rows in memory;
+        the default parses the whole file as a single chunk.
+        """
+        yield self.parse_file(file_path)
+
     def clean_dataframe(self, df):
-        """Common cleanup operations for all parsers"""
+        """
+        Common cleanup operations for all parsers.
+
+        Strips whitespace from the column names and the known text columns once, then
+        aligns to the declared schema: amounts become float64 with NaN for blanks and
+        low-cardinality columns become categoricals. Optional columns are kept if present.
+        """
         self.logger.debug("Cleaning DataFrame")
         # Clean whitespace
         df = df.rename(columns=lambda x: x.strip())
-        df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-        
-        # Clean up numeric columns
-        for col in ['Deposit', 'Withdrawal']:
+        for col in STRING_COLUMNS:
             if col in df.columns:
-                df[col] = pd.to_numeric(df[col].replace('', '0'), errors='coerce')
-                df[col] = df[col].fillna('')
-        
-        # Ensure standard column order
-        standard_columns = ['Financial Institution', 'Account Name', 'Account Number', 
-                          'Date', 'Transaction', 'Currency', 'Deposit', 'Withdrawal', 
-                          'Running Balance']
+                df[col] = df[col].astype('string').str.strip()
         
-        # Add missing columns with empty values
-        for col in standard_columns:
-            if col not in df.columns:
-                df[col] = ''
-                
-        return df[standard_columns]
+        # Ensure standard column order, followed by any optional columns
+        columns = STANDARD_COLUMNS + [col for col in OPTIONAL_COLUMNS if col in df.columns]
+        return align_to_schema(df, columns)
 
+@register_parser
 class StandardCharteredAccountParser(TransactionParser):
-    def parse_file(self, file_path):
-        """Parser for Standard Chartered bank format"""
-        self.logger.info(f"Processing Standard Chartered file: {file_path}")
-        
-        # Read account info from header
-        with open(file_path, "r") as file:
-            lines = file.readlines()
+    # Column header line: Date,Transaction,Currency,Deposit,Withdrawal,Running Balance
+    header_signature = re.compile(r'^"?Date"?\s*,\s*"?Transaction"?\s*,.*"?Running Balance"?', re.MULTILINE)
+
+    # Line holding the account name and number, and lines before the column header
+    ACCOUNT_LINE = 3
+    HEADER_ROWS = 5
+
+    def read_account_details(self, file_path):
+        """Read (account name, account number) from the header lines only"""
+        with open(file_path, "r", encoding='utf-8') as file:
+            lines = list(itertools.islice(file, self.HEADER_ROWS))
         
-        account_number = lines[3].split(",")[1].strip()
+        account_line = lines[self.ACCOUNT_LINE].split(",")
+        account_number = account_line[1].strip()
         account_number = account_number[1:]  # Remove the first character
-        account_name = lines[3].split(",")[0].strip()
-        
-        # Read transaction data
-        df = pd.read_csv(file_path, 
-                        skiprows=5,
-                        on_bad_lines='warn',
-                        skipinitialspace=True,
-                        quoting=csv.QUOTE_ALL,
-                        thousands=',',
-                        encoding='utf-8')
-        
-        # Clean up dataframe first
+        account_name = account_line[0].strip()
+        return account_name, account_number
+
+    def read_transactions(self, file_path, chunksize=None):
+        """Read the transaction rows below the header, optionally as an iterator of chunks"""
+        return pd.read_csv(file_path, 
+                           skiprows=self.HEADER_ROWS,
+                           on_bad_lines='warn',
+                           skipinitialspace=True,
+                           quoting=csv.QUOTE_ALL,
+                           thousands=',',
+                           encoding='utf-8',
+                           chunksize=chunksize)
+
+    def normalize(self, df, account_name, account_number, date_format=None):
+        """Turn raw transaction rows into the standard columns"""
+        # Clean up column names first
         df = df.rename(columns=lambda x: x.strip())  # Remove whitespace from column names
-        df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)  # Remove whitespace from values
         
         # Add account info
         df['Account Name'] = account_name
         df['Account Number'] = account_number
         df['Financial Institution'] = 'Standard Chartered'
         
-        # Convert date column after cleaning
-        df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
+        # Convert date column after cleaning, with the format inferred for this file
+        df['Date'] = parse_dates(df['Date'], date_format, parse_logger=self.logger)
         
         # Clean up balance columns
         if 'Running Balance' in df.columns:
-            df['Running Balance'] = (df['Running Balance']
-                                   .str.replace(' CR', '')
-                                   .str.replace(' DR', '')
-                                   .str.replace(',', '')
-                                   .astype(float))
+            df['Running Balance'] = pd.to_numeric(df['Running Balance'].astype('string')
+                                                  .str.replace(' CR', '')
+                                                  .str.replace(' DR', '')
+                                                  .str.replace(',', ''),
+                                                  errors='coerce')
         
         return self.clean_dataframe(df)
 
+    def parse_file(self, file_path):
+        """Parser for Standard Chartered bank format"""
+        self.logger.info("Processing Standard Chartered file: %s", file_path)
+        
+        account_name, account_number = self.read_account_details(file_path)
+        df = self.read_transactions(file_path)
+        return self.normalize(df, account_name, account_number)
+
+    def parse_file_chunks(self, file_path, chunksize):
+        """Stream a Standard Chartered bank export chunksize rows at a time"""
+        self.logger.info("Streaming Standard Chartered file in chunks of %s: %s", chunksize, file_path)
+        
+        account_name, account_number = self.read_account_details(file_path)
+        date_format = None
+        for chunk in self.read_transactions(file_path, chunksize=chunksize):
+            # Infer the date format from the first chunk and keep it for the rest of the file
+            date_format = date_format or infer_date_format(chunk['Date'])
+            yield self.normalize(chunk, account_name, account_number, date_format)
+
+@register_parser
 class StandardCharteredCreditCardParser(TransactionParser):
+    # Column header line: Date,DESCRIPTION,Foreign Currency Amount,SGD Amount
+    header_signature = re.compile(r'^"?Date"?\s*,\s*"?DESCRIPTION"?\s*,.*"?SGD Amount"?', re.MULTILINE)
+
     def parse_file(self, file_path):
         """Parser for Standard Chartered Credit Card format"""
-        self.logger.info(f"Processing Standard Chartered Credit Card file: {file_path}")
+        self.logger.info("Processing Standard Chartered Credit Card file: %s", file_path)
         
         try:
-            # Read account info from header
-            with open(file_path, "r") as file:
-                lines = [line.strip() for line in file.readlines() if line.strip()]  # Remove empty lines
-                
-            # Get account number from first line
-            account_number = lines[0].split(",")[1].strip().strip("'")
-            account_name = lines[0].split(",")[0].strip()
-            self.logger.info(f"Account Details: {account_name}, {account_number}")
+            # Single pass over the file: account info from the first line, then the
+            # transaction lines straight into an in-memory CSV buffer
+            buffer = io.StringIO()
+            buffer.write("Date,DESCRIPTION,Foreign Currency Amount,SGD Amount\n")
+            transaction_count = 0
             
-            # Find where transactions end (Current Balance line)
-            transaction_lines = []
-            for line in lines[3:]:  # Skip header lines
-                if line.startswith('Current Balance'):
-                    break
-                if ',' in line:  # Only include lines with data
-                    transaction_lines.append(line)
+            with open(file_path, "r", encoding='utf-8') as file:
+                lines = (line.strip() for line in file)
+                lines = (line for line in lines if line)  # Remove empty lines
+                
+                # Get account number from first line
+                first_line = next(lines)
+                account_number = first_line.split(",")[1].strip().strip("'")
+                account_name = first_line.split(",")[0].strip()
+                self.logger.info("Account Details: %s, %s", account_name, account_number)
+                
+                # Skip the remaining header lines
+                for _ in range(2):
+                    next(lines, None)
+                
+                # Transactions end at the Current Balance line
+                for line in lines:
+                    if line.startswith('Current Balance'):
+                        break
+                    if ',' in line:  # Only include lines with data
+                        buffer.write(line + "\n")
+                        transaction_count += 1
             
-            self.logger.debug(f"Found {len(transaction_lines)} transaction lines")
+            self.logger.debug("Found %s transaction lines", transaction_count)
             
-            # Write transactions to a temporary file without empty lines
-            import tempfile
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.csv') as temp_file:
-                # Write header
-                temp_file.write("Date,DESCRIPTION,Foreign Currency Amount,SGD Amount\n")
-                # Write transactions
-                for line in transaction_lines:
-                    temp_file.write(line + "\n")
-                temp_path = temp_file.name
-                
-            # Read the clean CSV file
-            df = pd.read_csv(temp_path,
+            buffer.seek(0)
+            df = pd.read_csv(buffer,
                             skipinitialspace=True,
                             quoting=csv.QUOTE_ALL,
-                            thousands=',',
-                            encoding='utf-8')
+                            thousands=',')
             
-            # Clean up temporary file
-            import os
-            os.unlink(temp_path)
-            
-            # Clean up dataframe
+            # Clean up column names
             df = df.rename(columns=lambda x: x.strip())
-            df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
             
             # Extract foreign currency info
-            foreign_currency_mask = df['Foreign Currency Amount'].notna() & (df['Foreign Currency Amount'] != '')
-            df['Foreign Currency'] = None
-            df['Foreign Amount'] = None
-            
-            if foreign_currency_mask.any():
-                df.loc[foreign_currency_mask, 'Foreign Currency'] = df.loc[foreign_currency_mask, 'Foreign Currency Amount'].str.extract(r'([A-Z]{3})')[0]
-                df.loc[foreign_currency_mask, 'Foreign Amount'] = df.loc[foreign_currency_mask, 'Foreign Currency Amount'].str.extract(r'([0-9,.]+)')[0].apply(
-                    lambda x: float(str(x).replace(',', '')) if pd.notnull(x) else None
-                )
+            foreign = df['Foreign Currency Amount'].astype('string')
+            df['Foreign Currency'] = foreign.str.extract(r'([A-Z]{3})')[0]
+            df['Foreign Amount'] = pd.to_numeric(
+                foreign.str.extract(r'([0-9,.]+)')[0].str.replace(',', ''), errors='coerce'
+            )
             
-            # Extract amount and type (DR/CR) from SGD Amount
-            df['Amount'] = df['SGD Amount'].str.extract(r'SGD\s*([\d,.]+)\s*(DR|CR)?')[0]
-            df['Type'] = df['SGD Amount'].str.extract(r'SGD\s*([\d,.]+)\s*(DR|CR)?')[1]
+            # Extract amount and type (DR/CR) from SGD Amount in one pass
+            amount_parts = df['SGD Amount'].astype('string').str.extract(r'SGD\s*([\d,.]+)\s*(DR|CR)?')
+            df['Amount'] = amount_parts[0]
+            df['Type'] = amount_parts[1]
             
             # Convert amount to float and apply DR/CR
             df['Amount'] = pd.to_numeric(df['Amount'].str.replace(',', ''), errors='coerce')
@@ -162,36 +277,38 @@ class StandardCharteredCreditCardParser(TransactionParser):
             df['Financial Institution'] = 'Standard Chartered'
             df['Currency'] = 'SGD'
             
-            # Convert date
-            df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
+            # Convert date, with the format inferred for this file
+            df['Date'] = parse_dates(df['Date'], parse_logger=self.logger)
             
             # Drop temporary columns but keep foreign currency info
             df = df.drop(['DESCRIPTION', 'Foreign Currency Amount', 'SGD Amount', 'Amount', 'Type'], axis=1)
             
-            # Ensure standard columns are first, followed by the foreign currency columns
-            standard_df = self.clean_dataframe(df.drop(['Foreign Currency', 'Foreign Amount'], axis=1))
-            
-            # Add foreign currency columns back
-            standard_df['Foreign Currency'] = df['Foreign Currency']
-            standard_df['Foreign Amount'] = df['Foreign Amount']
-            
-            return standard_df
+            # Standard columns first, followed by the foreign currency columns
+            return self.clean_dataframe(df)
             
         except Exception as e:
-            self.logger.error(f"Error parsing Standard Chartered Credit Card file: {str(e)}", exc_info=True)
+            self.logger.error("Error parsing Standard Chartered Credit Card file: %s", e, exc_info=True)
             raise
 
+def read_header_sample(file_path, size=SIGNATURE_SAMPLE_BYTES):
+    """Read the start of a file as text, for matching against parser header signatures"""
+    with open(file_path, 'rb') as file:
+        return file.read(size).decode('utf-8-sig', errors='replace')
+
 def get_parser_for_file(file_path):
-    """Factory function to return appropriate parser based on file characteristics"""
-    file_path = file_path.lower()
-    
-    if not file_path.endswith('.csv'):
+    """
+    Factory function to return the appropriate parser for a file.
+
+    The parser is chosen from its contents rather than its name: only the first
+    SIGNATURE_SAMPLE_BYTES are read and checked against each registered parser's
+    header signature, so unrecognised files fail before any full parse.
+    """
+    if not file_path.lower().endswith('.csv'):
         raise ValueError(f"Unsupported file format: {file_path}")
-        
-    if "standardchartered" in file_path or "scb" in file_path or "bonussaver" in file_path or "daily" in file_path or "esaver" in file_path:
-        return StandardCharteredAccountParser()
-    elif "journey" in file_path:
-        return StandardCharteredCreditCardParser()
     
-    # Default to Standard Chartered Account parser
-    return StandardCharteredAccountParser()
+    sample = read_header_sample(file_path)
+    for parser_class in PARSER_REGISTRY:
+        if parser_class.matches_header(sample):
+            return parser_class()
+    
+    raise ValueError(f"Unrecognised statement format: {file_path}")
@@ -0,0 +1,113 @@
+import glob
+import os
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from logger import setup_logger
+from transaction_parsers import align_to_schema, empty_transactions, STANDARD_COLUMNS, OPTIONAL_COLUMNS
+from deduplication import add_dedup_keys, drop_duplicate_transactions, DEDUP_COLUMNS
+
+logger = setup_logger(__name__)
+
+# Every file is stored with the full schema so the dataset reads back with one set of column types
+STORE_COLUMNS = STANDARD_COLUMNS + OPTIONAL_COLUMNS
+
+# Hive partition keys derived from each row; values are URI-encoded into the directory names
+PARTITION_COLUMNS = ['institution', 'account', 'year']
+
+class TransactionStore:
+    """
+    Partitioned Parquet dataset of parsed transactions, the canonical store for the pipeline.
+
+    Rows are partitioned by institution/account/year. Each ingested file's rows are written
+    as parts named after the file's content hash, so a changed or removed statement can be
+    replaced without touching the rest of the history. Every row is stored with its dedup
+    key, so overlapping statements are deduplicated at read time without re-hashing.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = str(store_dir)
+        self.dataset_dir = os.path.join(self.store_dir, 'transactions')
+        os.makedirs(self.dataset_dir, exist_ok=True)
+
+    def _parts(self, sha256=None):
+        pattern = f"{sha256}-*.parquet" if sha256 else '*.parquet'
+        return glob.glob(os.path.join(self.dataset_dir, '**', pattern), recursive=True)
+
+    def write(self, sha256, transactions_df):
+        """Store the transactions parsed from the file with this content hash"""
+        # Replace rather than add to any parts already written for this content
+        self.remove(sha256)
+        self.append(sha256, transactions_df)
+
+    def append(self, sha256, transactions_df, part=0):
+        """
+        Add a chunk of a file's transactions to the store, without touching earlier chunks.
+
+        Used in streaming mode, where each chunk is written as soon as it is parsed. Chunks
+        should already carry dedup keys numbered across the whole file; otherwise they are
+        computed for this chunk alone.
+        """
+        if not set(DEDUP_COLUMNS).issubset(transactions_df.columns):
+            transactions_df = add_dedup_keys(transactions_df)
+
+        # Plain strings on disk; categoricals are rebuilt once the whole dataset is read
+        df = align_to_schema(transactions_df, STORE_COLUMNS, categorical=False)
+        df[DEDUP_COLUMNS] = transactions_df[DEDUP_COLUMNS]
+        df['institution'] = df['Financial Institution'].fillna('unknown')
+        df['account'] = df['Account Number'].fillna('unknown')
+        df['year'] = df['Date'].dt.year.astype('Int64').astype('string').fillna('unknown')
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_to_dataset(
+            table,
+            self.dataset_dir,
+            partition_cols=PARTITION_COLUMNS,
+            basename_template=f"{sha256}-{part:06d}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        logger.debug("Stored %s transactions for %s (part %s)", len(df), sha256, part)
+
+    def remove(self, sha256):
+        """Remove a stored file's transactions if present"""
+        for part in self._parts(sha256):
+            os.remove(part)
+            # Tidy up partition directories left empty
+            directory = os.path.dirname(part)
+            while directory != self.dataset_dir and not os.listdir(directory):
+                os.rmdir(directory)
+                directory = os.path.dirname(directory)
+            logger.debug("Removed %s from transaction store", part)
+
+    def read(self, hashes=None, columns=None, filter=None, deduplicate=True):
+        """
+        Load stored transactions.
+
+        Args:
+            hashes (list, optional): Only read parts for these content hashes. Defaults to everything.
+            columns (list, optional): Column projection - only these columns are read from disk.
+            filter (pyarrow.dataset.Expression, optional): Row filter pushed down to the Parquet scan,
+                e.g. ds.field('year') == '2024' to prune partitions.
+            deduplicate (bool): Drop rows repeated across overlapping statements.
+
+        Returns:
+            pd.DataFrame: Transactions with the declared column dtypes.
+        """
+        columns = list(columns or STORE_COLUMNS)
+        parts = self._parts()
+        if hashes is not None:
+            wanted = set(hashes)
+            parts = [part for part in parts if os.path.basename(part).split('-', 1)[0] in wanted]
+        if not parts:
+            return empty_transactions(columns)
+
+        # Read in a stable order so the combined frame doesn't depend on directory listing order
+        dataset = ds.dataset(sorted(parts), format='parquet', partitioning='hive',
+                             partition_base_dir=self.dataset_dir)
+        if not deduplicate:
+            return align_to_schema(dataset.to_table(columns=columns, filter=filter).to_pandas(), columns)
+
+        # Read the dedup keys alongside the requested columns, then drop them again
+        table = dataset.to_table(columns=columns + [col for col in DEDUP_COLUMNS if col not in columns], filter=filter)
+        df = drop_duplicate_transactions(table.to_pandas())
+        return align_to_schema(df, columns).reset_index(drop=True)
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The application modules import each other by bare name (e.g. `from config import config`),
+# so make src importable the same way it is when running `python src/main.py`.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+# Keep test runs out of the app's real log files; set before any module sets up logging,
+# and inherited by the subprocesses some tests start
+os.environ['TRANSACTION_TRACKER_LOGS_DIR'] = tempfile.mkdtemp(prefix='transactiontracker-logs-')
@@ -0,0 +1,31 @@
+"""Small Standard Chartered statement exports in the layouts the parsers expect"""
+import os
+
+ACCOUNT_STATEMENT = '''Account transactions shown:,01/01/2024 - 31/01/2024
+Currency:,SGD
+,
+BONUS$AVER ACCOUNT,'0123456789
+,
+Date,Transaction,Currency,Deposit,Withdrawal,Running Balance
+"03/01/2024","PAYNOW-GRABFOOD 12345 ","SGD","","12.50","1,987.50 CR"
+"05/01/2024","SALARY GIRO","SGD","5,000.00","","6,987.50 CR"
+"07/01/2024"," NTUC FAIRPRICE BEDOK","SGD","","45.20","6,942.30 CR"
+'''
+
+CREDIT_CARD_STATEMENT = '''JOURNEY CARD,'5555-1234-5678-9012
+
+Statement Date,15/01/2024
+Date,DESCRIPTION,Foreign Currency Amount,SGD Amount
+02/01/2024,GRAB*RIDE SINGAPORE,,SGD 15.20 DR
+04/01/2024,AMAZON.COM SEATTLE,USD 20.00,"SGD 27.10 DR"
+09/01/2024,PAYMENT - THANK YOU,,"SGD 1,000.00 CR"
+
+Current Balance,"SGD 500.00"
+'''
+
+def write_statement(directory, filename, content):
+    """Write a statement export into directory and return its path"""
+    file_path = os.path.join(directory, filename)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return file_path
@@ -0,0 +1,255 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+import ai_functions
+from categorisation_cache import CategorisationCache
+from fake_gemini import FakeGeminiModel
+from rule_classifier import RuleClassifier
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class EchoModel:
+    """Categorises every row it is sent as Food/Groceries, optionally dropping some rows"""
+
+    def __init__(self, drop_row_ids=()):
+        self.calls = 0
+        self.drop_row_ids = set(drop_row_ids)
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls += 1
+        self.prompts.append(prompt)
+        transaction_block = prompt.split('Transactions:')[1].split('```')[1]
+        row_ids = [int(line.split('|')[0]) for line in transaction_block.strip().splitlines()]
+        return FakeResponse(json.dumps([[row_id, 0, 0] for row_id in row_ids if row_id not in self.drop_row_ids]))
+
+
+class TruncatingModel(EchoModel):
+    """Cuts its JSON answer off mid-array whenever it is sent more than max_rows rows"""
+
+    def __init__(self, max_rows):
+        super().__init__()
+        self.max_rows = max_rows
+
+    def generate_content(self, prompt, generation_config=None):
+        response = super().generate_content(prompt, generation_config)
+        if len(json.loads(response.text)) > self.max_rows:
+            response.text = response.text[:len(response.text) // 2]
+        return response
+
+
+class PoisonRowModel(EchoModel):
+    """Cuts its JSON answer off whenever it is sent the poison row"""
+
+    def __init__(self, poison_row_id):
+        super().__init__()
+        self.poison_row_id = poison_row_id
+
+    def generate_content(self, prompt, generation_config=None):
+        response = super().generate_content(prompt, generation_config)
+        if any(row_id == self.poison_row_id for row_id, _, _ in json.loads(response.text)):
+            response.text = response.text[:-1]
+        return response
+
+
+CONTEXT = ai_functions.build_categorisation_context({'Food': ['Groceries', 'Cafes'], 'Transfers': ['Family']})
+
+
+def make_transactions(count):
+    return pd.DataFrame({
+        'Date': ['01/01/2024'] * count,
+        'Transaction': [f"NTUC FAIRPRICE {i}" for i in range(count)],
+        'Withdrawal': [float(i) for i in range(count)],
+    })
+
+
+class TestChunkedCategorisation(unittest.TestCase):
+
+    def test_chunk_size_follows_output_budget(self):
+        df = make_transactions(500)
+        small = ai_functions.rows_per_chunk(df, max_output_tokens=256)
+        large = ai_functions.rows_per_chunk(df, max_output_tokens=8192)
+        self.assertGreaterEqual(small, 1)
+        self.assertGreater(large, small)
+
+    def test_every_row_is_categorised_across_chunks(self):
+        df = make_transactions(300)
+        model = EchoModel()
+        categorized_df = ai_functions.categorise_dataframe(model, df, CONTEXT, max_output_tokens=256)
+
+        self.assertGreater(model.calls, 1)
+        self.assertEqual(len(categorized_df), 300)
+        self.assertTrue((categorized_df['Category'] == 'Food').all())
+        self.assertListEqual(list(categorized_df['Transaction']), list(df['Transaction']))
+        self.assertNotIn(ai_functions.ROW_ID_COLUMN, categorized_df.columns)
+
+    def test_dropped_rows_stay_aligned(self):
+        df = make_transactions(50)
+        model = EchoModel(drop_row_ids={3, 10})
+        categorized_df = ai_functions.categorise_dataframe(model, df, CONTEXT)
+
+        self.assertEqual(len(categorized_df), 50)
+        self.assertTrue(pd.isna(categorized_df.loc[3, 'Category']))
+        self.assertTrue(pd.isna(categorized_df.loc[10, 'Category']))
+        self.assertEqual(categorized_df['Category'].notna().sum(), 48)
+
+
+    def test_truncated_responses_are_retried_in_halves(self):
+        model = TruncatingModel(max_rows=30)
+        categorized_df = ai_functions.categorise_dataframe(model, make_transactions(100), CONTEXT)
+
+        self.assertTrue(categorized_df['Category'].notna().all())
+        self.assertGreater(model.calls, 4)
+
+    def test_a_row_that_always_fails_only_loses_itself(self):
+        model = PoisonRowModel(poison_row_id=137)
+        categorized_df = ai_functions.categorise_dataframe(model, make_transactions(300), CONTEXT)
+
+        self.assertEqual(len(categorized_df), 300)
+        uncategorised = categorized_df.index[categorized_df['Category'].isna()].tolist()
+        self.assertListEqual(uncategorised, [137])
+
+    def test_rule_matches_skip_the_model(self):
+        df = pd.DataFrame({'Transaction': ['GRAB*RIDE', 'SPOTIFY', 'GRAB*RIDE 2']})
+        model = EchoModel()
+        rules = RuleClassifier([('GRAB', 'Transportation', 'Taxi')])
+        categorized_df = ai_functions.categorise_with_rules(model, df, CONTEXT, rules)
+
+        self.assertEqual(model.calls, 1)
+        self.assertListEqual(categorized_df['Category'].tolist(), ['Transportation', 'Food', 'Transportation'])
+
+
+    def test_prompt_is_compact(self):
+        df = pd.DataFrame({'Row ID': [7], 'Transaction': ['NTUC | FAIRPRICE'], 'Deposit': [None], 'Withdrawal': [12.5]})
+        self.assertEqual(ai_functions.encode_transactions(df), '7|NTUC FAIRPRICE|-12.50')
+
+    def test_invalid_tuples_are_dropped(self):
+        response = json.dumps([[0, 1, 0], [1, 5, 0], [2, 0, 9], [0, 0, 0], [99, 0, 0], ['3', 0, 0], [4, 0]])
+        results = ai_functions.parse_categorisation_response(response, CONTEXT, [0, 1, 2, 3, 4])
+        self.assertListEqual(results['Row ID'].tolist(), [0, 2])
+        self.assertListEqual(results['Category'].tolist(), ['Transfers', 'Food'])
+        self.assertEqual(results.loc[0, 'Sub-Category'], 'Family')
+        self.assertTrue(pd.isna(results.loc[1, 'Sub-Category']))
+
+
+class TestConcurrentCategorisation(unittest.TestCase):
+
+    def categorise(self, model, max_concurrency, **kwargs):
+        start = time.perf_counter()
+        categorized_df = ai_functions.categorise_dataframe(
+            model, make_transactions(400), CONTEXT, max_output_tokens=256,
+            max_concurrency=max_concurrency, **kwargs)
+        return categorized_df, time.perf_counter() - start
+
+    def test_concurrency_cuts_wall_clock_time(self):
+        sequential_df, sequential_time = self.categorise(FakeGeminiModel(latency=0.05), 1)
+        model = FakeGeminiModel(latency=0.05)
+        concurrent_df, concurrent_time = self.categorise(model, 4)
+
+        self.assertGreaterEqual(model.calls, 4)
+        self.assertEqual(model.max_in_flight, 4)
+        self.assertLess(concurrent_time, sequential_time / 2)
+        pd.testing.assert_frame_equal(sequential_df, concurrent_df)
+
+    def test_rate_limited_requests_are_retried(self):
+        model = FakeGeminiModel(latency=0, rate_limit_every=3)
+        with mock.patch.object(ai_functions, 'backoff_delay', return_value=0):
+            categorized_df, _ = self.categorise(model, 2)
+        self.assertTrue(categorized_df['Category'].notna().all())
+
+    def test_token_bucket_paces_requests(self):
+        bucket = ai_functions.TokenBucket(capacity_per_minute=600)  # 10 per second
+        start = time.perf_counter()
+        for _ in range(605):
+            bucket.acquire()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.4)
+
+
+class TestCachedCategorisation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = CategorisationCache(os.path.join(self.tmp.name, 'cache.sqlite'), 'test-config')
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_repeat_descriptions_skip_the_model(self):
+        df = pd.DataFrame({
+            'Transaction': ['NTUC FAIRPRICE 123456', 'NTUC  fairprice 654321', 'SPOTIFY', 'SPOTIFY'],
+            'Withdrawal': [10.0, 20.0, 9.9, 9.9],
+        })
+        model = EchoModel()
+        first = ai_functions.categorise_with_cache(model, df, CONTEXT, self.cache)
+        self.assertEqual(model.calls, 1)
+        self.assertTrue((first['Category'] == 'Food').all())
+
+        second = ai_functions.categorise_with_cache(model, df, CONTEXT, self.cache)
+        self.assertEqual(model.calls, 1)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_eviction_keeps_newest_entries(self):
+        self.cache.max_entries = 2
+        for i in range(3):
+            self.cache.store({f"MERCHANT {i}": ('Food', 'Cafes')})
+            time.sleep(0.01)
+        self.cache.evict()
+        self.assertEqual(set(self.cache.lookup(['MERCHANT 0', 'MERCHANT 1', 'MERCHANT 2'])), {'MERCHANT 1', 'MERCHANT 2'})
+
+
+class TestGeminiCategoriser(unittest.TestCase):
+
+    def setUp(self):
+        import google.generativeai as genai
+        self.model = EchoModel()
+        patches = [
+            mock.patch.object(genai, 'configure'),
+            mock.patch.object(genai, 'GenerativeModel'),
+            mock.patch.object(genai.caching.CachedContent, 'create'),
+        ]
+        self.configure, self.generative_model, self.create_cache = [patch.start() for patch in patches]
+        for patch in patches:
+            self.addCleanup(patch.stop)
+        self.generative_model.return_value = self.model
+        self.generative_model.from_cached_content.return_value = self.model
+
+    def test_requests_carry_only_the_rows(self):
+        self.create_cache.side_effect = Exception("Cached content is too small")
+        with ai_functions.GeminiCategoriser('gemini-test', CONTEXT, 'key') as categoriser:
+            for _ in range(2):
+                categorized_df = ai_functions.categorise_dataframe(categoriser, make_transactions(300), CONTEXT,
+                                                                   max_output_tokens=256)
+                self.assertTrue(categorized_df['Category'].notna().all())
+
+        self.configure.assert_called_once_with(api_key='key')
+        self.generative_model.assert_called_once_with('gemini-test', system_instruction=CONTEXT.instructions)
+        self.assertGreater(self.model.calls, 2)
+        self.assertEqual(categoriser.prefix_reuses, self.model.calls)
+        self.assertTrue(all(prompt.startswith('Transactions:') for prompt in self.model.prompts))
+
+    def test_instructions_are_cached_and_deleted_on_close(self):
+        cached_content = self.create_cache.return_value
+        categoriser = ai_functions.GeminiCategoriser('gemini-test', CONTEXT, 'key', cache_ttl_seconds=600)
+        ai_functions.categorise_dataframe(categoriser, make_transactions(10), CONTEXT)
+        categoriser.close()
+
+        self.assertEqual(self.create_cache.call_args.kwargs['system_instruction'], CONTEXT.instructions)
+        self.generative_model.from_cached_content.assert_called_once_with(cached_content=cached_content)
+        self.generative_model.assert_not_called()
+        self.assertEqual(self.model.calls, 1)
+        cached_content.delete.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+import functions
+from run_benchmarks import STAGES, compare, run_size
+from synthetic_statements import write_account_statement, write_credit_card_statement
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_synthetic_statements_parse_completely(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            for writer, name in [(write_account_statement, 'bonussaver.csv'), (write_credit_card_statement, 'journey.csv')]:
+                file_path = writer(os.path.join(work_dir, name), 500)
+                df = functions.process_transactions(file_path)
+                self.assertEqual(len(df), 500, name)
+                self.assertFalse(df['Date'].isna().any(), name)
+                self.assertTrue((df['Deposit'].notna() | df['Withdrawal'].notna()).all(), name)
+
+    def test_every_stage_is_measured_on_the_store_path(self):
+        result = run_size('1k', 200, workers=1)
+
+        self.assertEqual(list(result['stages']), STAGES)
+        self.assertEqual(result['rows'], 400)
+        self.assertEqual(result['stages']['ingest']['rows'], 400)
+        self.assertTrue(all(stage['peak_rss_mb'] for stage in result['stages'].values()))
+
+    def test_regressions_are_flagged_beyond_tolerance(self):
+        baselines = {'1k': {'stages': {'parse': {'rows_per_sec': 1000}, 'store_read': {'rows_per_sec': 1000}}}}
+        results = {'1k': {'stages': {'parse': {'rows_per_sec': 700}, 'store_read': {'rows_per_sec': 900}}}}
+        regressions = compare(results, baselines, tolerance=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('1k parse'))
@@ -0,0 +1,25 @@
+import unittest
+
+from config import Config
+
+
+class TestConfig(unittest.TestCase):
+
+    def test_data_path_is_substituted_throughout_config_yaml(self):
+        config = Config()
+        data_path = config.get('paths.data')
+
+        self.assertEqual(config.get('fx.rates_file'), f"{data_path}/fx_rates.csv")
+        self.assertEqual(config.get('logging.file'), f"{data_path}/logs/app.log")
+        self.assertEqual(config.store_dir, f"{data_path}/store/")
+
+    def test_get_returns_default_for_missing_keys(self):
+        config = Config()
+        config._loaded = {'api': {'model_name': 'gemini'}, 'logging': None}
+
+        self.assertEqual(config.get('api.model_name', 'other'), 'gemini')
+        self.assertEqual(config.get('api.max_output_tokens', 8192), 8192)
+        self.assertEqual(config.get('ingestion.workers', 4), 4)
+        self.assertEqual(config.get('logging.queue', True), True)
+        self.assertEqual(config.get('api.model_name.version', 'v1'), 'v1')
+        self.assertIsNone(config.get('api.nonexistent'))
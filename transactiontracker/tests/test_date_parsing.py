@@ -0,0 +1,32 @@
+import logging
+import unittest
+
+import pandas as pd
+
+from date_parsing import infer_date_format, parse_dates
+
+
+class TestDateParsing(unittest.TestCase):
+
+    def test_infers_day_first_for_ambiguous_dates(self):
+        self.assertEqual(infer_date_format(pd.Series(['03/04/2024', '05/04/2024'])), '%d/%m/%Y')
+
+    def test_infers_other_formats(self):
+        self.assertEqual(infer_date_format(pd.Series(['2024-01-31', '2024-02-01'])), '%Y-%m-%d')
+        self.assertEqual(infer_date_format(pd.Series(['31 Jan 2024', '01 Feb 2024'])), '%d %b %Y')
+        self.assertEqual(infer_date_format(pd.Series(['01/31/2024', '02/01/2024'])), '%m/%d/%Y')
+
+    def test_unparseable_rows_are_reported_not_fatal(self):
+        values = pd.Series(['03/04/2024', ' 03/04/2024', 'Opening balance', '04/04/2024', None])
+        with self.assertLogs('TestDates', level='WARNING') as logs:
+            parsed = parse_dates(values, parse_logger=logging.getLogger('TestDates'))
+
+        self.assertEqual(parsed[0], pd.Timestamp('2024-04-03'))
+        self.assertEqual(parsed[1], pd.Timestamp('2024-04-03'))
+        self.assertTrue(pd.isna(parsed[2]))
+        self.assertTrue(pd.isna(parsed[4]))
+        self.assertIn("row 2: 'Opening balance'", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+import functions
+from deduplication import add_dedup_keys, drop_duplicate_transactions
+from ingestion_manifest import IngestionManifest
+from transaction_store import TransactionStore
+from sample_statements import ACCOUNT_STATEMENT, write_statement
+
+# Two identical coffees on the same day, a genuine repeat that must survive dedup
+COFFEE = '"08/01/2024","COFFEE BEAN","SGD","","5.00","6,937.30 CR"\n'
+
+class TestDeduplication(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.tmp.name, 'input')
+        self.store_dir = os.path.join(self.tmp.name, 'store')
+        os.makedirs(self.input_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def parse(self, content, filename='statement.csv'):
+        file_path = write_statement(self.input_dir, filename, content)
+        return functions.get_parser_for_file(file_path).parse_file(file_path)
+
+    def test_same_day_repeats_get_distinct_occurrences(self):
+        keyed = add_dedup_keys(self.parse(ACCOUNT_STATEMENT + COFFEE + COFFEE))
+        coffees = keyed[keyed['Transaction'] == 'COFFEE BEAN']
+        self.assertEqual(coffees['Row Hash'].nunique(), 1)
+        self.assertEqual(coffees['Occurrence'].tolist(), [0, 1])
+        self.assertEqual(len(drop_duplicate_transactions(keyed)), 5)
+
+    def test_occurrences_continue_across_chunks(self):
+        df = self.parse(ACCOUNT_STATEMENT + COFFEE + COFFEE)
+        seen = {}
+        chunks = [add_dedup_keys(df.iloc[:4], seen), add_dedup_keys(df.iloc[4:], seen)]
+        self.assertEqual([chunk['Occurrence'].iloc[-1] for chunk in chunks], [0, 1])
+
+    def test_overlapping_statements_are_deduplicated_across_runs(self):
+        monthly = write_statement(self.input_dir, 'bonussaver_jan.csv', ACCOUNT_STATEMENT + COFFEE)
+        manifest = IngestionManifest(os.path.join(self.store_dir, 'manifest.json'))
+        store = TransactionStore(self.store_dir)
+        functions.ingest_files([monthly], manifest, store)
+        self.assertEqual(len(store.read(manifest.hashes())), 4)
+
+        # A later quarterly download repeats January, including a second coffee
+        quarterly = write_statement(self.input_dir, 'bonussaver_q1.csv', ACCOUNT_STATEMENT + COFFEE + COFFEE
+                                    + '"02/02/2024","SALARY GIRO","SGD","5,000.00","","11,937.30 CR"\n')
+        functions.ingest_files([monthly, quarterly], manifest, store)
+
+        combined = store.read(manifest.hashes())
+        self.assertEqual(len(combined), 6)
+        self.assertEqual((combined['Transaction'] == 'COFFEE BEAN').sum(), 2)
+        self.assertEqual(len(store.read(manifest.hashes(), deduplicate=False)), 10)
@@ -0,0 +1,174 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import ai_functions
+import embedding_classifier
+from categorisation_cache import CategorisationCache
+from config import config
+from embedding_classifier import EmbeddingClassifier, GeminiEmbedder, HashingEmbedder, VectorIndex
+from fake_gemini import FakeResponse
+
+HISTORY = pd.DataFrame({
+    'Transaction': ['NTUC FAIRPRICE BEDOK 123456', 'GRAB*RIDE SINGAPORE', 'NETFLIX.COM', 'SHELL TAMPINES', None],
+    'Category': ['Food', 'Transportation', 'Entertainment', 'Transportation', 'Food'],
+    'Sub-Category': ['Groceries', 'Taxi', 'Streaming', 'Fuel', 'Cafes'],
+})
+
+CONTEXT = ai_functions.build_categorisation_context({'Shopping': ['Online'], 'Food': ['Groceries']})
+
+
+class RecordingModel:
+    """Answers every row as Shopping/Online and records the descriptions it was sent"""
+
+    def __init__(self):
+        self.descriptions = []
+
+    def generate_content(self, prompt, generation_config=None):
+        lines = prompt.split('Transactions:')[1].split('```')[1].strip().splitlines()
+        self.descriptions.extend(line.split('|')[1] for line in lines)
+        return FakeResponse(json.dumps([[int(line.split('|')[0]), 0, 0] for line in lines]))
+
+
+class CountingEmbedder(HashingEmbedder):
+    """HashingEmbedder that records every text it embeds"""
+
+    def __init__(self):
+        super().__init__()
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return super().embed(texts)
+
+
+class TestEmbeddingClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = EmbeddingClassifier.from_history(HISTORY, HashingEmbedder(), similarity_threshold=0.6)
+
+    def test_nearest_neighbour_categories(self):
+        result = self.classifier.classify(pd.Series(
+            ['NTUC FAIRPRICE TAMPINES 998877', 'NETFLIX.COM 4455', 'PAYNOW TO JOHN TAN', None]))
+
+        self.assertEqual(result.loc[0, ['Category', 'Sub-Category']].tolist(), ['Food', 'Groceries'])
+        self.assertEqual(result.loc[1, 'Category'], 'Entertainment')
+        self.assertAlmostEqual(result.loc[1, 'Similarity'], 1.0, places=5)
+        self.assertTrue(pd.isna(result.loc[2, 'Category']))
+        self.assertTrue(pd.isna(result.loc[3, 'Category']))
+
+    def test_quantized_index_finds_the_same_neighbours(self):
+        embeddings = HashingEmbedder().embed(['NTUC FAIRPRICE', 'GRAB RIDE', 'NETFLIX', 'SHELL', 'STARBUCKS'])
+        queries = HashingEmbedder().embed(['NTUC FAIRPRICE BEDOK', 'GRAB FOOD', 'SHELL PASIR RIS'])
+
+        exact_scores, exact_indices = VectorIndex(embeddings).search(queries, k=2)
+        quantized_scores, quantized_indices = VectorIndex(embeddings, quantize=True).search(queries, k=2)
+
+        np.testing.assert_array_equal(quantized_indices[:, 0], exact_indices[:, 0])
+        np.testing.assert_allclose(quantized_scores, exact_scores, atol=0.02)
+
+    def test_blocked_search_matches_a_full_sort(self):
+        rng = np.random.default_rng(0)
+        embeddings = rng.normal(size=(50, 16)).astype(np.float32)
+        queries = rng.normal(size=(7, 16)).astype(np.float32)
+
+        with mock.patch.object(embedding_classifier, 'SEARCH_BATCH_SIZE', 3), \
+                mock.patch.object(embedding_classifier, 'SEARCH_BLOCK_SIZE', 4):
+            scores, indices = VectorIndex(embeddings).search(queries, k=6)
+
+        expected = np.argsort(-(queries @ embeddings.T), axis=1)[:, :6]
+        np.testing.assert_array_equal(indices, expected)
+        np.testing.assert_allclose(scores, np.take_along_axis(queries @ embeddings.T, expected, axis=1), rtol=1e-5)
+
+    def test_only_low_confidence_rows_reach_gemini(self):
+        df = pd.DataFrame({
+            'Transaction': ['NTUC FAIRPRICE BEDOK 556677', 'SHOPEE SINGAPORE', 'NETFLIX.COM'],
+            'Withdrawal': [45.2, 12.0, 15.98],
+        })
+        model = RecordingModel()
+        categorized_df = ai_functions.categorise_with_rules(model, df, CONTEXT, embeddings=self.classifier)
+
+        self.assertEqual(model.descriptions, ['SHOPEE SINGAPORE'])
+        self.assertEqual(categorized_df['Category'].tolist(), ['Food', 'Shopping', 'Entertainment'])
+
+    def test_exact_description_beats_neighbour_votes(self):
+        history = pd.DataFrame({
+            'Transaction': ['SHELL TAMPINES'] + [f"SHELL TAMPINES SELECT {i}" for i in range(4)],
+            'Category': ['Transportation'] + ['Food'] * 4,
+            'Sub-Category': ['Fuel'] + ['Cafes'] * 4,
+        })
+        embedder = CountingEmbedder()
+        classifier = EmbeddingClassifier.from_history(history, embedder, similarity_threshold=0.5)
+        embedder.embedded.clear()
+
+        result = classifier.classify(pd.Series(['SHELL TAMPINES']))
+
+        self.assertEqual(result.loc[0, ['Category', 'Sub-Category']].tolist(), ['Transportation', 'Fuel'])
+        self.assertEqual(embedder.embedded, [])
+
+    def test_history_embeddings_are_saved_and_reused(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache_path = os.path.join(cache_dir, 'embeddings.hashing.npz')
+            EmbeddingClassifier.from_history(HISTORY.iloc[:2], CountingEmbedder(), cache_path=cache_path)
+
+            embedder = CountingEmbedder()
+            classifier = EmbeddingClassifier.from_history(HISTORY, embedder, cache_path=cache_path)
+
+        self.assertEqual(embedder.embedded, ['NETFLIX.COM', 'SHELL TAMPINES'])
+        self.assertEqual(classifier.classify(pd.Series(['GRAB*RIDE SINGAPORE'])).loc[0, 'Category'], 'Transportation')
+
+    def test_cached_descriptions_skip_the_embedding_step(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = CategorisationCache(os.path.join(cache_dir, 'cache.sqlite'), 'test-config')
+            cache.store({'NETFLIX.COM': ('Shopping', 'Online')})
+            embedder = CountingEmbedder()
+            classifier = EmbeddingClassifier.from_history(HISTORY, embedder, similarity_threshold=0.6)
+            embedder.embedded.clear()
+
+            df = pd.DataFrame({'Transaction': ['NETFLIX.COM', 'NTUC FAIRPRICE TAMPINES 998877'],
+                               'Withdrawal': [15.98, 20.0]})
+            categorized_df = ai_functions.categorise_with_rules(RecordingModel(), df, CONTEXT, cache=cache,
+                                                                embeddings=classifier)
+            cache.close()
+
+        self.assertEqual(categorized_df['Category'].tolist(), ['Shopping', 'Food'])
+        self.assertEqual(embedder.embedded, ['NTUC FAIRPRICE TAMPINES'])
+
+
+class TestOpenEmbeddingClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patches = [
+            mock.patch.dict(config._config['paths'], {'cache_dir': self.tmp.name, 'output_dir': self.tmp.name}),
+            mock.patch.dict(config._config['embedding_classifier'], {'backend': 'gemini'}),
+            mock.patch.object(embedding_classifier, 'load_categorised_history', return_value=HISTORY),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_each_backend_takes_its_own_options(self):
+        with mock.patch.object(GeminiEmbedder, 'embed', side_effect=HashingEmbedder().embed):
+            classifier = embedding_classifier.open_embedding_classifier()
+
+        self.assertIsInstance(classifier.embedder, GeminiEmbedder)
+        self.assertEqual(classifier.embedder.model_name,
+                         config.get('embedding_classifier.backend_options.gemini.model_name'))
+
+    def test_categorisation_continues_without_a_broken_classifier(self):
+        model = RecordingModel()
+        model.context, model.rate_limiter = CONTEXT, None
+        df = pd.DataFrame({'Transaction': ['SHOPEE SINGAPORE'], 'Withdrawal': [12.0]})
+        with mock.patch.object(GeminiEmbedder, 'embed', side_effect=RuntimeError("embedding API unavailable")), \
+                mock.patch.dict(config._config['categorisation_cache'], {'enabled': False}):
+            categorized_df = ai_functions.gemini_dataframe_categorisation(df, categoriser=model)
+
+        self.assertEqual(categorized_df['Category'].tolist(), ['Shopping'])
+        self.assertEqual(model.descriptions, ['SHOPEE SINGAPORE'])
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import functions
+from ingestion_manifest import IngestionManifest
+from transaction_store import TransactionStore
+from sample_statements import ACCOUNT_STATEMENT, CREDIT_CARD_STATEMENT, write_statement
+
+
+class TestProcessFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file_paths = [
+            write_statement(self.tmp.name, 'bonussaver_jan.csv', ACCOUNT_STATEMENT),
+            write_statement(self.tmp.name, 'broken_scb.csv', 'not a statement\n'),
+            write_statement(self.tmp.name, 'journey_jan.csv', CREDIT_CARD_STATEMENT),
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parallel_matches_serial_and_isolates_failures(self):
+        serial = list(functions.process_files(self.file_paths, workers=1))
+        parallel = list(functions.process_files(self.file_paths, workers=2))
+
+        self.assertListEqual([result[0] for result in parallel], self.file_paths)
+        self.assertListEqual([len(result[1]) for result in parallel], [3, 0, 3])
+        for (_, serial_df, _), (_, parallel_df, elapsed) in zip(serial, parallel):
+            self.assertTrue(serial_df.equals(parallel_df))
+            self.assertGreaterEqual(elapsed, 0)
+
+
+class TestIncrementalIngestion(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.tmp.name, 'input')
+        self.store_dir = os.path.join(self.tmp.name, 'store')
+        os.makedirs(self.input_dir)
+        self.account = write_statement(self.input_dir, 'bonussaver_jan.csv', ACCOUNT_STATEMENT)
+        self.card = write_statement(self.input_dir, 'journey_jan.csv', CREDIT_CARD_STATEMENT)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def ingest(self, file_paths):
+        manifest = IngestionManifest(os.path.join(self.store_dir, 'manifest.json'))
+        store = TransactionStore(self.store_dir)
+        with mock.patch.object(functions, 'process_files', wraps=functions.process_files) as process_files:
+            changes = functions.ingest_files(file_paths, manifest, store)
+        parsed = process_files.call_args.args[0]
+        combined = store.read(manifest.hashes())
+        return changes, parsed, combined
+
+    def test_store_read_keeps_declared_dtypes(self):
+        _, _, combined = self.ingest([self.account, self.card])
+
+        self.assertEqual(len(combined), 6)
+        self.assertEqual(list(combined.columns)[-2:], ['Foreign Currency', 'Foreign Amount'])
+        for col in ['Deposit', 'Withdrawal', 'Running Balance', 'Foreign Amount']:
+            self.assertEqual(combined[col].dtype, 'float64')
+        self.assertEqual(str(combined['Date'].dtype), 'datetime64[ns]')
+        self.assertEqual(combined['Withdrawal'].sum(), 12.5 + 45.2 + 15.2 + 27.1)
+
+    def test_store_read_of_nothing(self):
+        combined = TransactionStore(self.store_dir).read([])
+        self.assertTrue(combined.empty)
+        self.assertEqual(combined['Deposit'].dtype, 'float64')
+
+    def test_only_new_or_changed_files_are_parsed(self):
+        changes, parsed, combined = self.ingest([self.account, self.card])
+        self.assertEqual((changes, len(parsed), len(combined)), (2, 2, 6))
+
+        changes, parsed, combined = self.ingest([self.account, self.card])
+        self.assertEqual((changes, parsed, len(combined)), (0, [], 6))
+
+        write_statement(self.input_dir, 'journey_jan.csv', CREDIT_CARD_STATEMENT.replace('SGD 15.20 DR', 'SGD 115.20 DR'))
+        changes, parsed, combined = self.ingest([self.account, self.card])
+        self.assertEqual((changes, parsed, len(combined)), (1, [self.card], 6))
+        self.assertIn(115.2, combined['Withdrawal'].tolist())
+
+        changes, parsed, combined = self.ingest([self.account])
+        self.assertEqual((changes, parsed, len(combined)), (1, [], 3))
+        self.assertEqual(len(TransactionStore(self.store_dir)._parts()), 1)
+
+    def test_large_files_are_streamed_in_chunks(self):
+        rows = ''.join(f'"{day:02d}/01/2024","PURCHASE {day}","SGD","","{day}.00","100.00 CR"\n' for day in range(1, 29))
+        large = write_statement(self.input_dir, 'bonussaver_big.csv', ACCOUNT_STATEMENT + rows)
+        expected = functions.get_parser_for_file(large).parse_file(large)
+
+        manifest = IngestionManifest(os.path.join(self.store_dir, 'manifest.json'))
+        store = TransactionStore(self.store_dir)
+        changes = functions.ingest_files([large, self.card], manifest, store,
+                                         streaming_threshold_bytes=1000, chunksize=4)
+
+        self.assertEqual(changes, 2)
+        self.assertEqual(manifest.get(large)['rows'], 31)
+        self.assertEqual(len(store._parts(manifest.get(large)['sha256'])), 8)
+        streamed = store.read([manifest.get(large)['sha256']])
+        self.assertEqual(streamed['Transaction'].tolist(), expected['Transaction'].tolist())
+        self.assertEqual(streamed['Withdrawal'].fillna(0).tolist(), expected['Withdrawal'].fillna(0).tolist())
+        self.assertEqual(len(store.read(manifest.hashes())), 34)
+
+
+class TestTransactionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = TransactionStore(self.tmp.name)
+        file_paths = [
+            write_statement(self.tmp.name, 'bonussaver_jan.csv', ACCOUNT_STATEMENT),
+            write_statement(self.tmp.name, 'journey_jan.csv', CREDIT_CARD_STATEMENT),
+        ]
+        for sha256, (_, df, _) in zip(['aaa', 'bbb'], functions.process_files(file_paths)):
+            self.store.write(sha256, df)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_partitioned_and_typed(self):
+        partitions = {os.path.relpath(os.path.dirname(part), self.store.dataset_dir) for part in self.store._parts()}
+        self.assertEqual(partitions, {
+            os.path.join('institution=Standard%20Chartered', 'account=0123456789', 'year=2024'),
+            os.path.join('institution=Standard%20Chartered', 'account=5555-1234-5678-9012', 'year=2024'),
+        })
+
+        df = self.store.read()
+        self.assertEqual(len(df), 6)
+        self.assertEqual(df['Withdrawal'].dtype, 'float64')
+        self.assertEqual(str(df['Date'].dtype), 'datetime64[ns]')
+
+    def test_projection_and_selection(self):
+        df = self.store.read(['bbb'], columns=['Transaction', 'Withdrawal'])
+        self.assertListEqual(list(df.columns), ['Transaction', 'Withdrawal'])
+        self.assertEqual(len(df), 3)
+
+        self.store.remove('bbb')
+        self.assertEqual(len(self.store.read()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
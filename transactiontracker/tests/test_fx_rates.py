@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from fx_rates import load_fx_rates, normalize_currency
+
+RATES_CSV = """Date,Currency,Rate
+2024-01-01,USD,1.34
+2024-01-15,USD,1.36
+2024-01-01,EUR,1.45
+2024-01-10,usd,not a rate
+"""
+
+
+class TestFxRates(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rates_file = os.path.join(self.tmp.name, 'fx_rates.csv')
+        with open(self.rates_file, 'w') as f:
+            f.write(RATES_CSV)
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_rows_use_the_latest_rate_on_or_before_their_date(self):
+        df = pd.DataFrame({
+            'Date': pd.to_datetime(['2024-01-20', '2024-01-14', '2024-01-15', '2024-01-03', '2024-01-03', '2023-12-31']),
+            'Currency': pd.Series(['USD', 'USD', 'USD', 'SGD', 'JPY', 'EUR'], dtype='category'),
+            'Deposit': [100.0, None, None, 10.0, None, None],
+            'Withdrawal': [None, 10.0, 10.0, None, 500.0, 1.0],
+        })
+        result = normalize_currency(df, load_fx_rates(self.rates_file, self.cache_dir), 'SGD')
+
+        self.assertEqual(result['FX Rate'].fillna(0).tolist(), [1.36, 1.34, 1.36, 1.0, 0, 0])
+        self.assertAlmostEqual(result.loc[0, 'Reporting Deposit'], 136.0)
+        self.assertAlmostEqual(result.loc[1, 'Reporting Withdrawal'], 13.4)
+        self.assertTrue(pd.isna(result.loc[4, 'Reporting Withdrawal']))
+        self.assertEqual(result['Currency'].tolist(), df['Currency'].tolist())
+
+    def test_rate_table_is_cached_until_the_file_changes(self):
+        first = load_fx_rates(self.rates_file, self.cache_dir)
+        self.assertEqual(len(first), 3)
+
+        with mock.patch('fx_rates.read_rate_file') as read_rate_file:
+            cached = load_fx_rates(self.rates_file, self.cache_dir)
+        read_rate_file.assert_not_called()
+        pd.testing.assert_frame_equal(cached, first)
+
+        with open(self.rates_file, 'a') as f:
+            f.write("2024-02-01,EUR,1.47\n")
+        self.assertEqual(len(load_fx_rates(self.rates_file, self.cache_dir)), 4)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
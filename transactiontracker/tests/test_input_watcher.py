@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from input_watcher import InputWatcher
+
+
+class TestInputWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.watcher = InputWatcher(self.tmp.name, interval=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_existing_files_are_reported_once(self):
+        path = os.path.join(self.tmp.name, 'bonussaver_jan.csv')
+        with open(path, 'w') as f:
+            f.write("statement")
+
+        batches = []
+        self.watcher.run(batches.append, max_batches=1)
+
+        self.assertEqual(batches, [[path]])
+        self.assertEqual(self.watcher.changed_paths(self.watcher.scan()), [])
+
+    def test_files_still_being_written_wait_until_they_settle(self):
+        path = os.path.join(self.tmp.name, 'bonussaver_feb.csv')
+        scans = [{path: (10, 1)}, {path: (20, 2)}, {path: (30, 3)}, {path: (30, 3)}, {}, {}]
+
+        batches = []
+        with mock.patch.object(self.watcher, 'scan', side_effect=scans):
+            self.watcher.run(batches.append, max_batches=2)
+
+        self.assertEqual(batches, [[path], [path]])
+        self.assertEqual(self.watcher.snapshot, {})
@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+import unittest
+
+import ai_functions
+import functions
+import instrumentation
+from fake_gemini import FakeGeminiModel
+from sample_statements import ACCOUNT_STATEMENT, CREDIT_CARD_STATEMENT, write_statement
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stage_totals_and_json_report(self):
+        report = instrumentation.RunReport()
+        for rows in (100, 300):
+            with report.stage('parse.Example') as stage:
+                stage.rows = rows
+                stage.bytes_read = 1000
+
+        report_path = report.write(self.tmp.name)
+        with open(report_path, encoding='utf-8') as f:
+            written = json.load(f)
+
+        parse = written['stages']['parse.Example']
+        self.assertEqual((parse['calls'], parse['rows'], parse['bytes_read']), (2, 400, 2000))
+        self.assertIn('rows_per_sec', parse)
+        self.assertGreater(written['peak_rss_mb'], 0)
+
+    def test_worker_stages_are_merged_into_the_run_report(self):
+        file_paths = [
+            write_statement(self.tmp.name, 'bonussaver_jan.csv', ACCOUNT_STATEMENT),
+            write_statement(self.tmp.name, 'journey_jan.csv', CREDIT_CARD_STATEMENT),
+        ]
+        with instrumentation.capture() as report:
+            list(functions.process_files(file_paths, workers=2))
+
+        self.assertEqual(report.stages['process_transactions']['calls'], 2)
+        self.assertEqual(report.stages['parse.StandardCharteredAccountParser']['rows'], 3)
+        self.assertEqual(report.stages['parse.StandardCharteredCreditCardParser']['bytes_read'],
+                         os.path.getsize(file_paths[1]))
+
+    def test_generate_content_tokens_are_recorded(self):
+        with instrumentation.capture() as report:
+            ai_functions.generate_with_retry(FakeGeminiModel(latency=0), "Transactions:\n```\n0|COFFEE|-5.00\n```")
+
+        gemini = report.stages['gemini.generate_content']
+        self.assertEqual(gemini['calls'], 1)
+        self.assertGreater(gemini['tokens_in'], 0)
+        self.assertGreater(gemini['tokens_out'], 0)
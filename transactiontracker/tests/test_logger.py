@@ -0,0 +1,68 @@
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import functions
+import logger as logger_module
+from config import config
+from logger import Payload, setup_logger
+from sample_statements import ACCOUNT_STATEMENT, write_statement
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestLogger(unittest.TestCase):
+
+    def test_loggers_share_one_handler_set(self):
+        self.assertEqual(setup_logger('test_logger.a').handlers, setup_logger('test_logger.b').handlers)
+
+    def test_first_record_is_emitted_once(self):
+        file_target, console_target = ListHandler(), ListHandler()
+        with mock.patch.object(logger_module, '_handlers', None), \
+                mock.patch.object(logger_module, '_pending_loggers', []), \
+                mock.patch.object(logger_module, '_build_handlers', return_value=[file_target, console_target]), \
+                mock.patch.dict(config._config['logging'], {'queue': False, 'level': 'INFO'}):
+            logger = setup_logger('test_logger.first_record')
+            logger.info("first")
+            logger.debug("filtered")
+            logger.info("second")
+
+        for target in (file_target, console_target):
+            self.assertListEqual([record.getMessage() for record in target.records], ['first', 'second'])
+
+    def test_worker_records_are_written_by_the_parent(self):
+        target = ListHandler()
+        with tempfile.TemporaryDirectory() as tmp:
+            file_paths = [write_statement(tmp, f"bonussaver_{month}.csv", ACCOUNT_STATEMENT) for month in ('jan', 'feb')]
+            logger_module.configure_logging()
+            with mock.patch.object(logger_module, '_targets', [target]):
+                list(functions.process_files(file_paths, workers=2))
+
+        worker_records = [record for record in target.records if record.process != os.getpid()]
+        for file_path in file_paths:
+            messages = [record.getMessage() for record in worker_records]
+            self.assertEqual(messages.count(f"Getting parser for file: {file_path}"), 1)
+
+    def test_payloads_log_size_and_hash_unless_enabled(self):
+        with mock.patch.dict(config._config['logging'], {'log_payloads': False}):
+            summary = str(Payload('x' * 5000))
+        self.assertRegex(summary, r'^<5000 chars, sha256 [0-9a-f]{12}>$')
+
+        with mock.patch.dict(config._config['logging'], {'log_payloads': True}):
+            self.assertEqual(str(Payload('full prompt')), 'full prompt')
+
+    def test_payload_is_not_formatted_when_filtered(self):
+        with mock.patch.object(Payload, '__str__', return_value='prompt') as formatted:
+            logger = logging.getLogger('test_logger.filtered')
+            logger.setLevel(logging.INFO)
+            logger.debug("Prompt: %s", Payload('prompt'))
+        formatted.assert_not_called()
@@ -1,10 +1,116 @@
+import os
+import tempfile
 import unittest
-from src.main import your_function  # Replace with the actual function you want to test
+from unittest import mock
+
+import pandas as pd
+
+import main
+from config import config
+from sample_statements import ACCOUNT_STATEMENT, write_statement
+
 
 class TestMain(unittest.TestCase):
-    
-    def test_your_function(self):
-        self.assertEqual(your_function(args), expected_result)  # Replace with actual arguments and expected result
+
+    def test_categorize_transactions_sends_every_row(self):
+        transactions_df = pd.DataFrame({
+            'Transaction': [f"PAYNOW-VENDOR {i}" for i in range(120)],
+            'Withdrawal': [float(i) for i in range(120)],
+        })
+
+        with mock.patch('ai_functions.gemini_dataframe_categorisation',
+                        side_effect=lambda df, categoriser=None: df) as categorisation, \
+                mock.patch.object(main, 'update_rollups') as update_rollups:
+            categorized_df = main.categorize_transactions(transactions_df)
+
+        categorisation.assert_called_once()
+        update_rollups.assert_called_once()
+        self.assertEqual(len(categorized_df), 120)
+
+    def test_process_transactions_reads_the_store(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            paths = {
+                'input_dir': os.path.join(data_dir, 'input'),
+                'output_dir': os.path.join(data_dir, 'output'),
+                'store_dir': os.path.join(data_dir, 'store'),
+            }
+            for path in paths.values():
+                os.makedirs(path)
+            write_statement(paths['input_dir'], 'bonussaver_jan.csv', ACCOUNT_STATEMENT)
+
+            with mock.patch.dict(config._config['paths'], paths), \
+                    mock.patch.dict(config._config, {'export': {'formats': ['csv']}, 'ingestion': {'workers': 1}}):
+                first = main.process_transactions()
+                second = main.process_transactions()
+                exported = os.listdir(paths['output_dir'])
+
+        self.assertEqual(len(first), 3)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(exported, ['combined_transactions.csv'])
+
+    def test_exports_on_demand_include_reporting_currency(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            paths = {name: os.path.join(data_dir, name) for name in ['input_dir', 'output_dir', 'store_dir', 'cache_dir']}
+            for path in paths.values():
+                os.makedirs(path)
+            write_statement(paths['input_dir'], 'bonussaver_jan.csv', ACCOUNT_STATEMENT)
+            rates_file = os.path.join(data_dir, 'fx_rates.csv')
+            with open(rates_file, 'w') as f:
+                f.write("Date,Currency,Rate\n2020-01-01,USD,1.35\n")
+
+            with mock.patch.dict(config._config['paths'], paths), \
+                    mock.patch.dict(config._config, {'export': {'formats': []}, 'ingestion': {'workers': 1},
+                                                     'fx': {'rates_file': rates_file, 'reporting_currency': 'SGD'}}):
+                main.process_transactions()
+                exported = main.export_transactions(['csv'])
+            combined = pd.read_csv(exported[0])
+
+        self.assertTrue({'FX Rate', 'Reporting Deposit', 'Reporting Withdrawal'}.issubset(combined.columns))
+        self.assertEqual(combined['FX Rate'].tolist(), [1.0] * len(combined))
+
+    def test_categorize_command_sees_the_same_columns_as_ingestion(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            paths = {name: os.path.join(data_dir, name) for name in ['input_dir', 'output_dir', 'store_dir', 'cache_dir']}
+            for path in paths.values():
+                os.makedirs(path)
+            write_statement(paths['input_dir'], 'bonussaver_jan.csv', ACCOUNT_STATEMENT)
+            rates_file = os.path.join(data_dir, 'fx_rates.csv')
+            with open(rates_file, 'w') as f:
+                f.write("Date,Currency,Rate\n2020-01-01,USD,1.35\n")
+
+            with mock.patch.dict(config._config['paths'], paths), \
+                    mock.patch.dict(config._config, {'export': {'formats': []}, 'ingestion': {'workers': 1},
+                                                     'fx': {'rates_file': rates_file, 'reporting_currency': 'SGD'}}), \
+                    mock.patch('ai_functions.gemini_dataframe_categorisation',
+                               side_effect=lambda df, categoriser=None: df), \
+                    mock.patch.object(main, 'update_rollups'):
+                ingested = main.process_transactions()
+                categorized_df = main.categorize_transactions()
+
+        self.assertListEqual(categorized_df.columns.tolist(), ingested.columns.tolist())
+        self.assertIn('Reporting Withdrawal', categorized_df.columns)
+
+    def test_commands_run_without_prompting(self):
+        with mock.patch.object(main, 'process_transactions') as process_transactions, \
+                mock.patch.object(main, 'categorize_transactions', return_value=None), \
+                mock.patch.object(main, 'run_interactive') as run_interactive, \
+                mock.patch.object(main.instrumentation.report, 'write'):
+            self.assertEqual(main.main(['ingest']), 0)
+            self.assertEqual(main.main(['categorize']), 1)
+
+        process_transactions.assert_called_once_with()
+        run_interactive.assert_not_called()
+
+    def test_watch_ingests_each_batch(self):
+        with tempfile.TemporaryDirectory() as input_dir:
+            write_statement(input_dir, 'bonussaver_jan.csv', ACCOUNT_STATEMENT)
+            with mock.patch.dict(config._config['paths'], {'input_dir': input_dir}), \
+                    mock.patch.object(main, 'process_transactions', return_value=pd.DataFrame()) as process_transactions, \
+                    mock.patch.object(main.instrumentation.report, 'write') as write_report:
+                main.watch_input_dir(interval=0, max_batches=1)
+
+        process_transactions.assert_called_once_with()
+        write_report.assert_called_once()
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import unittest
+
+import pandas as pd
+
+import ai_functions
+from fake_gemini import FakeChatSession
+from query_engine import TransactionQueryEngine, MAX_RESULT_ROWS
+
+TRANSACTIONS = pd.DataFrame({
+    'Date': pd.to_datetime(['2024-02-28', '2024-03-02', '2024-03-15', '2024-03-20', '2024-03-25']),
+    'Account Number': ['0123'] * 5,
+    'Transaction': ['NTUC FAIRPRICE', 'NTUC FAIRPRICE', 'COFFEE BEAN', 'GRAB RIDE', 'SALARY GIRO'],
+    'Currency': ['SGD'] * 5,
+    'Deposit': [None, None, None, None, 5000.0],
+    'Withdrawal': [40.0, 45.2, 5.5, 18.0, None],
+    'Category': ['Food', 'Food', 'Food', 'Transportation', 'Income'],
+    'Sub-Category': ['Groceries', 'Groceries', 'Cafes', 'Taxi', 'Salary'],
+})
+
+
+class TestQueryEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = TransactionQueryEngine(TRANSACTIONS)
+
+    def test_summarise_spending_filters_and_groups_locally(self):
+        result = self.engine.call('summarise_spending', {
+            'group_by': ['sub_category'], 'category': 'food', 'start_date': '2024-03-01', 'end_date': '2024-03-31'})
+
+        self.assertEqual(result['matching_transactions'], 2)
+        self.assertEqual([(group['Sub-Category'], group['withdrawals']) for group in result['groups']],
+                         [('Groceries', 45.2), ('Cafes', 5.5)])
+
+    def test_find_transactions_is_capped(self):
+        result = self.engine.call('find_transactions', {'description_contains': 'ntuc', 'limit': 1000})
+        self.assertEqual(result['matching_transactions'], 2)
+        self.assertLessEqual(len(result['transactions']), MAX_RESULT_ROWS)
+        self.assertEqual(result['transactions'][0]['Date'], '2024-03-02')
+
+    def test_totals_use_reporting_currency_when_present(self):
+        transactions = pd.DataFrame({
+            'Date': pd.to_datetime(['2024-03-02', '2024-03-05']),
+            'Account Number': ['0123', '9876'],
+            'Transaction': ['NTUC FAIRPRICE', 'WHOLE FOODS'],
+            'Currency': ['SGD', 'USD'],
+            'Deposit': [None, None],
+            'Withdrawal': [40.0, 100.0],
+            'Category': ['Food', 'Food'],
+            'Reporting Deposit': [None, None],
+            'Reporting Withdrawal': [40.0, 135.0],
+        })
+        engine = TransactionQueryEngine(transactions)
+
+        summary = engine.call('summarise_spending', {'group_by': []})
+        self.assertEqual(summary['groups'][0]['withdrawals'], 175.0)
+        self.assertEqual(summary['amounts_in'], 'SGD')
+        self.assertEqual(engine.call('find_transactions', {'min_amount': 120})['matching_transactions'], 1)
+
+    def test_bad_calls_return_errors_for_the_model(self):
+        self.assertIn('error', self.engine.call('drop_tables', {}))
+        self.assertIn('error', self.engine.call('summarise_spending', {'group_by': ['colour']}))
+
+    def test_chat_answers_through_function_calls(self):
+        session = FakeChatSession([('summarise_spending', {'group_by': ['month'], 'category': 'Food'})])
+        answer = ai_functions.send_with_tools(session, self.engine, "What did I spend on Food each month?")
+
+        groups = json.loads(answer)[0]['groups']
+        self.assertEqual({group['Month']: group['withdrawals'] for group in groups}, {'2024-03': 50.7, '2024-02': 40.0})
+        # Only the question and the small aggregated result were sent to the model
+        self.assertEqual(len(session.sent), 2)
+        self.assertEqual(session.sent[1][0]['function_response']['name'], 'summarise_spending')
@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+
+import pandas as pd
+
+from rollups import SpendRollups
+
+
+def categorised(rows):
+    return pd.DataFrame(rows, columns=['Account Number', 'Date', 'Transaction', 'Currency',
+                                       'Deposit', 'Withdrawal', 'Running Balance', 'Category', 'Sub-Category'])
+
+
+JANUARY = categorised([
+    ['0123', pd.Timestamp('2024-01-03'), 'NTUC FAIRPRICE', 'SGD', None, 45.2, 1000.0, 'Food', 'Groceries'],
+    ['0123', pd.Timestamp('2024-01-05'), 'COFFEE BEAN', 'SGD', None, 5.0, 995.0, 'Food', 'Cafes'],
+    ['0123', pd.Timestamp('2024-01-05'), 'COFFEE BEAN', 'SGD', None, 5.0, 995.0, 'Food', 'Cafes'],
+    ['0123', pd.Timestamp('2024-01-25'), 'SALARY GIRO', 'SGD', 5000.0, None, 5995.0, 'Income', 'Salary'],
+])
+
+FEBRUARY = categorised([
+    ['0123', pd.Timestamp('2024-02-02'), 'SHENG SIONG', 'SGD', None, 30.0, 5965.0, 'Food', 'Groceries'],
+])
+
+
+class TestSpendRollups(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_totals_counts_and_averages(self):
+        rollups = SpendRollups(self.tmp.name)
+        self.assertEqual(rollups.sync(JANUARY), (4, 0))
+
+        food = rollups.query(group_by=['Month', 'Category'], categories=['Food']).iloc[0]
+        self.assertEqual((food['Month'], food['Transactions'], food['Withdrawals']), ('2024-01', 3, 3))
+        self.assertAlmostEqual(food['Withdrawal Total'], 55.2)
+        self.assertAlmostEqual(food['Average Withdrawal'], 18.4)
+        self.assertTrue(pd.isna(food['Average Deposit']))
+
+    def test_sync_persists_and_follows_recategorisation(self):
+        SpendRollups(self.tmp.name).sync(JANUARY)
+
+        # Reopened from disk, only the new February row is aggregated
+        rollups = SpendRollups(self.tmp.name)
+        self.assertEqual(rollups.sync(pd.concat([JANUARY, FEBRUARY])), (1, 0))
+        self.assertEqual(rollups.sync(pd.concat([JANUARY, FEBRUARY])), (0, 0))
+
+        # Re-categorising a coffee moves it between rollup rows
+        recategorised = pd.concat([JANUARY, FEBRUARY], ignore_index=True)
+        recategorised.loc[1, ['Category', 'Sub-Category']] = ['Entertainment', 'Dining']
+        self.assertEqual(rollups.sync(recategorised), (1, 1))
+
+        by_category = SpendRollups(self.tmp.name).query(group_by=['Category']).set_index('Category')
+        self.assertEqual(by_category.loc['Food', 'Transactions'], 3)
+        self.assertEqual(by_category.loc['Entertainment', 'Transactions'], 1)
+        self.assertAlmostEqual(by_category.loc['Food', 'Withdrawal Total'], 80.2)
+
+    def test_added_batches_keep_earlier_rows(self):
+        rollups = SpendRollups(self.tmp.name)
+        self.assertEqual(rollups.add(JANUARY), 4)
+        self.assertEqual(SpendRollups(self.tmp.name).add(FEBRUARY), 1)
+        self.assertEqual(SpendRollups(self.tmp.name).add(FEBRUARY), 0)
+
+        by_month = SpendRollups(self.tmp.name).query(group_by=['Month']).set_index('Month')
+        self.assertEqual(by_month['Transactions'].to_dict(), {'2024-01': 4, '2024-02': 1})
+
+        # A later sync with the full history finds nothing to change
+        self.assertEqual(SpendRollups(self.tmp.name).sync(pd.concat([JANUARY, FEBRUARY])), (0, 0))
@@ -0,0 +1,47 @@
+import unittest
+
+import pandas as pd
+
+from rule_classifier import RuleClassifier
+
+
+class TestRuleClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = RuleClassifier([
+            ('PAYNOW-GRABFOOD', 'Food', 'Delivery'),
+            ('JOHN DOE', 'Transfers', 'Friends'),
+            ('GRAB', 'Transportation', 'Taxi'),
+            ('NTUC', 'Food', 'Groceries'),
+        ])
+
+    def test_classify(self):
+        descriptions = pd.Series([
+            'PAYNOW-GRABFOOD 12345',
+            'grab*ride singapore',
+            'PAYNOW TRANSFER TO JOHN DOE',
+            'NTUC FP-BEDOK',
+            'AGRABAH TOURS',
+            None,
+        ])
+        result = self.rules.classify(descriptions)
+        self.assertListEqual(
+            result['Category'].tolist()[:4],
+            ['Food', 'Transportation', 'Transfers', 'Food'])
+        self.assertEqual(result.loc[0, 'Sub-Category'], 'Delivery')
+        # 'GRAB' inside 'AGRABAH' is not at a word start
+        self.assertTrue(result['Category'].iloc[4:].isna().all())
+
+    def test_from_config(self):
+        config = {
+            'paynow_vendors': [{'vendor': 'PAYNOW-SHOPEE', 'category': 'Shopping', 'subcategory': 'Household Items'}],
+            'external_individuals': [],
+            'keyword_rules': [{'keyword': 'SPOTIFY', 'category': 'Entertainment', 'subcategory': 'Subscriptions'}],
+        }
+        rules = RuleClassifier.from_config(config)
+        result = rules.classify(pd.Series(['SPOTIFY P1234', 'PAYNOW-SHOPEE']))
+        self.assertListEqual(result['Category'].tolist(), ['Entertainment', 'Shopping'])
+
+
+if __name__ == '__main__':
+    unittest.main()
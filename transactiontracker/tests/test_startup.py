@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# Generous wall-clock ceiling for importing main; the module check below is the precise guard
+IMPORT_BUDGET_SECONDS = 3.0
+
+# Dependencies only categorisation, chat or xlsx export should pull in
+DEFERRED_MODULES = ['google.generativeai', 'ai_functions', 'openpyxl']
+
+# Settings are only parsed once something needs them, e.g. the first log record
+CONFIG_MODULES = ['yaml', 'dotenv']
+
+IMPORT_SCRIPT = f'''
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(','.join(name for name in {DEFERRED_MODULES!r} if name in sys.modules))
+from config import config
+print(','.join(name for name in {CONFIG_MODULES!r} if name in sys.modules), config._loaded is not None)
+main.logger.info("first record")
+print(config._loaded is not None)
+'''
+
+class TestStartup(unittest.TestCase):
+
+    def test_importing_main_defers_config_ai_and_excel_dependencies(self):
+        # A fresh interpreter, since this test process has already imported everything
+        result = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=SRC_DIR,
+                                capture_output=True, text=True, check=True)
+        elapsed, loaded, config_loaded, loaded_on_first_record = result.stdout.splitlines()[-4:]
+
+        self.assertEqual(loaded, '')
+        self.assertEqual(config_loaded, ' False')
+        self.assertEqual(loaded_on_first_record, 'True')
+        self.assertLess(float(elapsed), IMPORT_BUDGET_SECONDS)
@@ -0,0 +1,89 @@
+import re
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from transaction_parsers import (StandardCharteredAccountParser, StandardCharteredCreditCardParser,
+                                 TransactionParser, PARSER_REGISTRY, register_parser, get_parser_for_file)
+from sample_statements import ACCOUNT_STATEMENT, CREDIT_CARD_STATEMENT, write_statement
+
+
+class TestStandardCharteredParsers(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_credit_card(self):
+        file_path = write_statement(self.tmp.name, 'journey_jan.csv', CREDIT_CARD_STATEMENT)
+        df = StandardCharteredCreditCardParser().parse_file(file_path)
+
+        self.assertEqual(len(df), 3)
+        self.assertEqual(df.loc[0, 'Account Number'], '5555-1234-5678-9012')
+        self.assertListEqual(df['Transaction'].tolist(), ['GRAB*RIDE SINGAPORE', 'AMAZON.COM SEATTLE', 'PAYMENT - THANK YOU'])
+        self.assertListEqual(pd.to_numeric(df['Withdrawal'], errors='coerce').tolist()[:2], [15.2, 27.1])
+        self.assertEqual(pd.to_numeric(df['Deposit'], errors='coerce').tolist()[2], 1000.0)
+        self.assertEqual(df.loc[1, 'Foreign Currency'], 'USD')
+        self.assertEqual(df.loc[1, 'Foreign Amount'], 20.0)
+        self.assertEqual(df.loc[0, 'Date'], pd.Timestamp('2024-01-02'))
+
+    def test_account(self):
+        file_path = write_statement(self.tmp.name, 'bonussaver_jan.csv', ACCOUNT_STATEMENT)
+        df = StandardCharteredAccountParser().parse_file(file_path)
+
+        self.assertEqual(len(df), 3)
+        self.assertEqual(df.loc[0, 'Account Name'], 'BONUS$AVER ACCOUNT')
+        self.assertEqual(df.loc[0, 'Account Number'], '0123456789')
+        self.assertEqual(pd.to_numeric(df['Deposit'], errors='coerce').tolist()[1], 5000.0)
+        self.assertListEqual(df['Running Balance'].tolist(), [1987.5, 6987.5, 6942.3])
+        self.assertListEqual(df['Transaction'].tolist(), ['PAYNOW-GRABFOOD 12345', 'SALARY GIRO', 'NTUC FAIRPRICE BEDOK'])
+        self.assertTrue(pd.isna(df.loc[0, 'Deposit']))
+
+    def test_normalized_dtypes(self):
+        file_path = write_statement(self.tmp.name, 'journey_jan.csv', CREDIT_CARD_STATEMENT)
+        df = StandardCharteredCreditCardParser().parse_file(file_path)
+
+        for col in ['Deposit', 'Withdrawal', 'Running Balance', 'Foreign Amount']:
+            self.assertEqual(df[col].dtype, 'float64')
+        for col in ['Financial Institution', 'Account Name', 'Currency', 'Foreign Currency']:
+            self.assertIsInstance(df[col].dtype, pd.CategoricalDtype)
+
+
+class TestGetParserForFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_dispatch_ignores_misleading_filenames(self):
+        card = write_statement(self.tmp.name, 'scb_daily.csv', CREDIT_CARD_STATEMENT)
+        account = write_statement(self.tmp.name, 'journey.csv', ACCOUNT_STATEMENT)
+        self.assertIsInstance(get_parser_for_file(card), StandardCharteredCreditCardParser)
+        self.assertIsInstance(get_parser_for_file(account), StandardCharteredAccountParser)
+
+    def test_unrecognised_format_fails_fast(self):
+        unknown = write_statement(self.tmp.name, 'scb.csv', 'Posting Date,Details,Amount\n')
+        with self.assertRaises(ValueError):
+            get_parser_for_file(unknown)
+
+    def test_new_formats_register_without_editing_the_factory(self):
+        with mock.patch('transaction_parsers.PARSER_REGISTRY', list(PARSER_REGISTRY)):
+            @register_parser
+            class OtherBankParser(TransactionParser):
+                header_signature = re.compile(r'^Posting Date,Details,Amount', re.MULTILINE)
+
+                def parse_file(self, file_path):
+                    return pd.DataFrame()
+
+            other = write_statement(self.tmp.name, 'other.csv', 'Posting Date,Details,Amount\n')
+            self.assertIsInstance(get_parser_for_file(other), OtherBankParser)
+
+
+if __name__ == '__main__':
+    unittest.main()